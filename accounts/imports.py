@@ -0,0 +1,134 @@
+import csv
+import datetime
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from store.models import Cart
+from .models import CustomUser
+
+# Columns (CSV header or JSON keys) copied onto the user; anything else is ignored.
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name', 'phone', 'address', 'birth_date']
+
+# Times a chunk is retried when usernames it is creating appear concurrently.
+CHUNK_ATTEMPTS = 3
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+
+def read_rows(fileobj, fmt='csv'):
+    """Stream ``(line number, row dict)`` pairs from a CSV file with a header or JSON lines."""
+    if fmt == 'csv':
+        reader = csv.DictReader(fileobj)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(fileobj, 1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except json.JSONDecodeError:
+                    yield number, None  # Rejected by _build_user like any unusable row.
+
+
+def _text(row, name):
+    """``row[name]`` as stripped text; JSON numbers and booleans are converted."""
+    value = row.get(name)
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        raise ValueError(f'{name} must be text')
+    return str(value).strip()
+
+
+def _build_user(row):
+    """An unsaved CustomUser for ``row``; raises ValueError when the row is unusable."""
+    if not isinstance(row, dict):
+        raise ValueError('expected a JSON object')
+    username = CustomUser.normalize_username(_text(row, 'username'))
+    if not username:
+        raise ValueError('missing username')
+    password = _text(row, 'password') or None
+    if password is not None:
+        try:
+            identify_hasher(password)
+        except ValueError:
+            raise ValueError('password is not in Django hasher format (algorithm$...)')
+    values = {name: _text(row, name) or None for name in USER_FIELDS if name in row}
+    values.update(
+        username=username,
+        email=CustomUser.objects.normalize_email(values.get('email') or ''),
+        first_name=values.get('first_name') or '',
+        last_name=values.get('last_name') or '',
+        # None stores an unusable password: the user has to reset it.
+        password=password or make_password(None),
+    )
+    if values.get('birth_date'):
+        values['birth_date'] = datetime.date.fromisoformat(values['birth_date'])
+    return CustomUser(**values)
+
+
+def _import_chunk(rows, report, tokens):
+    users = {}
+    for number, row in rows:
+        try:
+            user = _build_user(row)
+        except (ValueError, TypeError) as exc:
+            report.errors.append((number, str(exc)))
+            continue
+        if user.username in users:
+            report.skipped += 1
+            continue
+        users[user.username] = (number, row)
+    for _ in range(CHUNK_ATTEMPTS):
+        existing = set(CustomUser.objects.filter(username__in=users).values_list('username', flat=True))
+        # Built afresh on every attempt: a failed bulk_create may leave pks set.
+        new_users = [_build_user(row) for username, (number, row) in users.items() if username not in existing]
+        if not new_users:
+            break
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(new_users)
+                Cart.objects.bulk_create([Cart(user=user) for user in new_users])
+                if tokens:
+                    Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in new_users])
+        except IntegrityError:
+            # Someone registered one of these usernames meanwhile; look again.
+            continue
+        report.created += len(new_users)
+        break
+    else:
+        for user in new_users:
+            report.errors.append((users[user.username][0], 'username was taken while importing'))
+        existing = set(users) - {user.username for user in new_users}
+    report.skipped += len(existing)
+
+
+def import_users(rows, chunk_size=5000, tokens=True, progress=None):
+    """Create users, carts and API tokens from ``(line number, row)`` pairs.
+
+    ``rows`` is consumed lazily, ``chunk_size`` at a time; each chunk is
+    written with one ``bulk_create`` per table in its own transaction.
+    Passwords must already be hashed in Django's ``algorithm$...`` format
+    (e.g. exported from another Django site, or migrated hashes wrapped by
+    a custom hasher), so nothing is hashed here; rows without a password get
+    an unusable one. Usernames that already exist are skipped, including
+    ones registered while the chunk is written (the chunk is retried).
+    ``progress`` is called with the report after each chunk.
+    """
+    report = ImportReport()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        _import_chunk(chunk, report, tokens)
+        if progress:
+            progress(report)
+    return report
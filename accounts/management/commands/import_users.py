@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.imports import import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Create users, carts and API tokens in bulk from a CSV file (with a header row) or JSON lines. '
+            'Passwords must be pre-hashed in Django\'s "algorithm$..." format.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file, or - for stdin')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Input format (default: from the file extension, csv for stdin)')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--no-tokens', action='store_true', help='Do not create API tokens')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        def progress(report):
+            if options['verbosity'] > 0:
+                self.stdout.write(f'... {report.created} created, {report.skipped} skipped, {len(report.errors)} errors')
+
+        try:
+            fileobj = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+            with fileobj:
+                report = import_users(read_rows(fileobj, fmt), chunk_size=options['chunk_size'],
+                                      tokens=not options['no_tokens'], progress=progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for number, message in report.errors:
+            self.stderr.write(f'line {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {report.created} users, skipped {report.skipped} existing or duplicate, '
+            f'{len(report.errors)} errors'
+        ))
@@ -1,3 +1,30 @@
+import io
+
 from django.test import TestCase
 
-# Create your tests here.
+from .imports import import_users, read_rows
+from .models import CustomUser
+
+
+class ImportUsersTests(TestCase):
+    def import_jsonl(self, text):
+        return import_users(read_rows(io.StringIO(text), fmt='jsonl'), tokens=False)
+
+    def test_bad_lines_are_rejected_without_stopping_the_import(self):
+        report = self.import_jsonl(
+            '{"username": "alice", "email": "alice@example.com"}\n'
+            '{"username": ["bob"]}\n'
+            '[1, 2]\n'
+            '{"username": \n'
+            '{"username": "carol", "birth_date": "not a date"}\n'
+            '{"username": "dave"}\n'
+        )
+        self.assertEqual(report.created, 2)
+        self.assertEqual([number for number, _ in report.errors], [2, 3, 4, 5])
+        self.assertEqual(set(CustomUser.objects.values_list('username', flat=True)), {'alice', 'dave'})
+
+    def test_numbers_are_read_as_text(self):
+        report = self.import_jsonl('{"username": 1001, "phone": 5550100, "first_name": " Ann "}\n')
+        self.assertEqual(report.created, 1)
+        user = CustomUser.objects.get(username='1001')
+        self.assertEqual((user.phone, user.first_name), ('5550100', 'Ann'))
@@ -0,0 +1,96 @@
+"""Sparse fieldsets (``?fields=``) and optional expansions (``?expand=``).
+
+Both parameters take comma-separated dotted paths relative to the top-level
+representation, e.g. ``?fields=id,name,category.name&expand=images``. A
+relation listed without sub-paths keeps all of its own fields.
+"""
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+class RequestedShape:
+    def __init__(self, fields=None, expand=None):
+        self.tree = None
+        for path in fields or ():
+            node = self.tree = self.tree if self.tree is not None else {}
+            for part in path.split('.'):
+                node = node.setdefault(part, {})
+        self.expand = set(expand or ())
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None:
+            return cls()
+        params = getattr(request, 'query_params', request.GET)
+        return cls(_split(params.get('fields')), _split(params.get('expand')))
+
+    def _subtree(self, path):
+        node = self.tree
+        for part in path:
+            if not node:
+                return None
+            node = node.get(part)
+            if node is None:
+                return None
+        return node or None
+
+    def allowed(self, path=()):
+        """Field names kept at ``path``, or None when every field is."""
+        node = self._subtree(path)
+        return set(node) if node else None
+
+    def includes(self, dotted):
+        """Whether the field at ``dotted`` is part of the response."""
+        parts = dotted.split('.')
+        for depth in range(len(parts)):
+            allowed = self.allowed(parts[:depth])
+            if allowed is not None and parts[depth] not in allowed:
+                return False
+        return True
+
+    def expands(self, dotted):
+        return dotted in self.expand and self.includes(dotted)
+
+    def expanded(self, path=()):
+        """Relation names expanded directly under ``path``."""
+        prefix = '.'.join(path)
+        names = set()
+        for entry in self.expand:
+            head, _, rest = entry.rpartition('.')
+            if head == prefix:
+                names.add(rest)
+        return names
+
+
+class DynamicFieldsMixin:
+    """Lets the request trim a serializer's fields and swap in expansions.
+
+    ``expandable_fields`` maps a field name to a factory returning the field
+    to use when the client asks for it via ``?expand=``. Fields that are
+    trimmed away are never evaluated, so their method fields and nested
+    serializers cost nothing.
+    """
+    expandable_fields = {}
+
+    def _path(self):
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                path.insert(0, node.field_name)
+            node = node.parent
+        return tuple(path)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        shape = RequestedShape.from_request(self.context.get('request'))
+        path = self._path()
+        for name in shape.expanded(path) & set(self.expandable_fields):
+            fields[name] = self.expandable_fields[name]()
+        allowed = shape.allowed(path)
+        if allowed is not None:
+            for name in set(fields) - allowed:
+                if not fields[name].write_only:
+                    del fields[name]
+        return fields
@@ -0,0 +1,179 @@
+"""Cache of per-object serialized representations ("fragments").
+
+A fragment is what a serializer renders for one object, stored under the
+object's id and ``updated_at`` so that any write produces a new key and stale
+entries simply age out. Changes that affect a product's representation
+without touching its row (image and category edits) bump
+``Product.updated_at`` in ``store.signals``.
+
+The first fragment rendered under a root serializer collects every object
+that will be rendered by a fragment serializer anywhere in the tree -- a
+product page, the products of every cart line -- and loads them with one
+``get_many``. Misses are rendered and written back with one ``set_many``.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import DisallowedHost
+from django.db.models import QuerySet
+from django.db.models.manager import BaseManager
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from furniture_store import metrics
+
+from .fieldsets import RequestedShape
+
+
+def fragment_cache():
+    return caches[getattr(settings, 'API_FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def fragments_enabled():
+    return getattr(settings, 'API_FRAGMENT_CACHE', True)
+
+
+def _represent(fields, instance):
+    # Serializer.to_representation restricted to ``fields``.
+    ret = {}
+    for field in fields:
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            continue
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        ret[field.field_name] = None if check_for_none is None else field.to_representation(attribute)
+    return ret
+
+
+def _loaded(value):
+    """Objects behind a to-many attribute, or None if reading them would query."""
+    if isinstance(value, BaseManager):
+        value = value.all()
+    if isinstance(value, QuerySet) and value._result_cache is None:
+        return None
+    return list(value)
+
+
+def _collect(serializer, objects, found):
+    if isinstance(serializer, ListSerializer):
+        _collect(serializer.child, objects, found)
+    elif isinstance(serializer, FragmentCacheMixin) and serializer.fragment_signature():
+        found.append((serializer, objects))
+    else:
+        for field in serializer._readable_fields:
+            if not isinstance(field, BaseSerializer):
+                continue
+            children = []
+            for obj in objects:
+                try:
+                    value = field.get_attribute(obj)
+                except (SkipField, AttributeError):
+                    continue
+                if value is None:
+                    continue
+                if isinstance(field, ListSerializer):
+                    value = _loaded(value)
+                    if value is None:
+                        continue
+                    children.extend(value)
+                else:
+                    children.append(value)
+            if children:
+                _collect(field, children, found)
+
+
+def _prime(root):
+    """Load the fragments of every object under ``root`` into a per-render memo."""
+    memo = {}
+    if root.instance is None:
+        return memo
+    objects = list(root.instance) if isinstance(root, ListSerializer) else [root.instance]
+    found = []
+    _collect(root, objects, found)
+    keys = {}
+    for serializer, instances in found:
+        for instance in instances:
+            keys.setdefault(serializer.fragment_key(instance), (serializer, instance))
+    if not keys:
+        return memo
+    cache = fragment_cache()
+    memo.update(cache.get_many(list(keys)))
+    misses = {key: serializer.render_fragment(instance)
+              for key, (serializer, instance) in keys.items() if key not in memo}
+    metrics.CACHE_REQUESTS.inc(len(keys) - len(misses), cache='fragments', result='hit')
+    metrics.CACHE_REQUESTS.inc(len(misses), cache='fragments', result='miss')
+    if misses:
+        cache.set_many(misses, getattr(settings, 'API_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60))
+        memo.update(misses)
+    return memo
+
+
+class FragmentCacheMixin:
+    """Serve this serializer's output from the fragment cache.
+
+    ``volatile_fields`` are left out of the cached fragment and rendered on
+    every call, for values that change without bumping the object's
+    ``updated_at``. The cache is bypassed when the serializer renders an
+    ``?expand=``-ed relation, since the nested object has its own lifetime.
+    """
+    volatile_fields = ()
+    version_field = 'updated_at'
+
+    def fragment_signature(self):
+        """Hash of the rendered field set and URL base, or None when not cacheable."""
+        if not hasattr(self, '_fragment_signature'):
+            self._fragment_signature = None
+            request = self.context.get('request')
+            expandable = set(getattr(self, 'expandable_fields', ()))
+            expanded = expandable and expandable & RequestedShape.from_request(request).expanded(self._path())
+            if fragments_enabled() and not expanded:
+                try:
+                    base = request.build_absolute_uri('/') if request else ''
+                except DisallowedHost:
+                    # Rendered uncached; only building an actual URL should fail.
+                    return None
+                names = ','.join(field.field_name for field in self._readable_fields)
+                digest = hashlib.md5(f'{base}|{names}'.encode(), usedforsecurity=False).hexdigest()[:12]
+                self._fragment_signature = f'{type(self).__name__}:{digest}'
+        return self._fragment_signature
+
+    def fragment_key(self, instance):
+        version = getattr(instance, self.version_field)
+        return f'fragment:{self.fragment_signature()}:{instance.pk}:{version.timestamp():.6f}'
+
+    def render_fragment(self, instance):
+        return _represent(
+            [field for field in self._readable_fields if field.field_name not in self.volatile_fields],
+            instance,
+        )
+
+    def to_representation(self, instance):
+        if not self.fragment_signature():
+            return super().to_representation(instance)
+        root = self.root
+        if not hasattr(root, '_fragment_memo'):
+            root._fragment_memo = _prime(root)
+        key = self.fragment_key(instance)
+        fragment = root._fragment_memo.get(key)
+        if fragment is None:
+            # Not reachable from the root's instance (e.g. a to-many relation
+            # that was not prefetched); fall back to a single lookup.
+            cache = fragment_cache()
+            fragment = cache.get(key)
+            if fragment is None:
+                fragment = self.render_fragment(instance)
+                cache.set(key, fragment, getattr(settings, 'API_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60))
+            root._fragment_memo[key] = fragment
+        volatile = _represent(
+            [field for field in self._readable_fields if field.field_name in self.volatile_fields],
+            instance,
+        )
+        return {
+            field.field_name: volatile[field.field_name] if field.field_name in volatile else fragment[field.field_name]
+            for field in self._readable_fields
+            if field.field_name in volatile or field.field_name in fragment
+        }
+
@@ -0,0 +1,115 @@
+"""Carts for anonymous visitors, kept in a signed cookie instead of the database.
+
+The cookie holds ``[[product_id, quantity], ...]`` signed (and compressed)
+with ``django.core.signing``, so guest browsing never writes Cart or
+CartItem rows. Products are looked up in one query when the cart is shown
+or changed, and ``store.carts.merge_items`` folds the cookie into the
+user's cart on login or registration.
+"""
+from django.conf import settings
+from django.core import signing
+from rest_framework.permissions import BasePermission
+
+from store.models import CartItem, Product
+from .fieldsets import RequestedShape
+from .serializers import ProductListSerializer
+
+COOKIE_SALT = 'api.guest_cart'
+
+
+def guest_carts_enabled():
+    return getattr(settings, 'GUEST_CARTS', True)
+
+
+def cookie_name():
+    return getattr(settings, 'GUEST_CART_COOKIE_NAME', 'guest_cart')
+
+
+def max_age():
+    return getattr(settings, 'GUEST_CART_MAX_AGE', 30 * 24 * 60 * 60)
+
+
+def max_items():
+    return getattr(settings, 'GUEST_CART_MAX_ITEMS', 50)
+
+
+class CartPermission(BasePermission):
+    """Signed-in users use their cart; anonymous visitors get a guest cart when enabled."""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated or guest_carts_enabled()
+
+
+def read(request):
+    """``{product_id: quantity}`` from the request's cookie; empty when missing or tampered with."""
+    value = request.COOKIES.get(cookie_name())
+    if not value:
+        return {}
+    try:
+        lines = signing.loads(value, salt=COOKIE_SALT, max_age=max_age())
+        return {int(product_id): int(quantity) for product_id, quantity in lines if int(quantity) > 0}
+    except (signing.BadSignature, TypeError, ValueError):
+        return {}
+
+
+def write(response, quantities):
+    if not quantities:
+        return clear(response)
+    value = signing.dumps([[pk, quantity] for pk, quantity in quantities.items()], salt=COOKIE_SALT, compress=True)
+    response.set_cookie(
+        cookie_name(), value, max_age=max_age(), httponly=True, samesite='Lax',
+        secure=getattr(settings, 'SESSION_COOKIE_SECURE', False),
+    )
+    return response
+
+
+def clear(response):
+    response.delete_cookie(cookie_name(), samesite='Lax')
+    return response
+
+
+def load(quantities, shape=None):
+    """Check ``quantities`` against the catalog in one query.
+
+    Returns ``(quantities, products)``: lines for unavailable or sold-out
+    products are dropped and the rest capped at the stock left, and
+    ``products`` maps ids to products loaded for the requested ``shape``.
+    """
+    if not quantities:
+        return {}, {}
+    queryset = ProductListSerializer.setup_eager_loading(
+        Product.objects.filter(pk__in=quantities, is_available=True, stock__gt=0),
+        shape or RequestedShape(), 'items.product.',
+    )
+    products = {product.pk: product for product in queryset}
+    return {pk: min(quantity, products[pk].stock) for pk, quantity in quantities.items() if pk in products}, products
+
+
+def items(quantities, products):
+    """Unsaved CartItems for the lines whose product is in ``products`` (a pk -> Product map)."""
+    return [
+        CartItem(product=products[pk], quantity=quantity)
+        for pk, quantity in quantities.items() if pk in products
+    ]
+
+
+class GuestCart:
+    """Stands in for a Cart in CartSerializer."""
+    id = None
+    user = None
+    updated_at = None
+
+    def __init__(self, items):
+        self.items = items
+
+    def serializable_value(self, field_name):
+        return getattr(self, field_name)
+
+    def get_total_price(self):
+        return sum(item.get_total_price() for item in self.items)
+
+    def get_total_items(self):
+        return len(self.items)
+
+    def get_total_items_count(self):
+        return sum(item.quantity for item in self.items)
@@ -0,0 +1,75 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import CustomUser
+from api.renderers import FastJSONRenderer, orjson
+from api.views import OrderListView, ProductListView
+
+
+class Command(BaseCommand):
+    help = ('Time the stdlib and orjson renderers on the /api/products/ and /api/orders/ '
+            'payloads and report response sizes with and without gzip')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--unpaginated', action='store_true',
+                            help='Render every row instead of the first page')
+        parser.add_argument('--user', help='Username whose orders are rendered (default: most orders)')
+
+    def host(self):
+        for host in settings.ALLOWED_HOSTS:
+            if host != '*':
+                return host.lstrip('.')
+        return 'localhost'
+
+    def fetch(self, view_class, path, user, unpaginated):
+        initkwargs = {'pagination_class': None} if unpaginated else {}
+        request = APIRequestFactory(HTTP_HOST=self.host()).get(path)
+        if user is not None:
+            force_authenticate(request, user=user)
+        response = view_class.as_view(**initkwargs)(request)
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        return response.data
+
+    def order_user(self, username):
+        if username:
+            user = CustomUser.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'No user {username!r}')
+            return user
+        user = CustomUser.objects.annotate(order_count=Count('orders')).order_by('-order_count').first()
+        if user is None:
+            raise CommandError('No users to render orders for; run populate_db first')
+        return user
+
+    def time_render(self, renderer, data, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            body = renderer.render(data, 'application/json', {})
+        return (time.perf_counter() - started) / repeat * 1000, body
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; FastJSONRenderer uses the stdlib path'))
+        unpaginated = options['unpaginated']
+        payloads = [
+            ('/api/products/', self.fetch(ProductListView, '/api/products/', None, unpaginated)),
+            ('/api/orders/', self.fetch(OrderListView, '/api/orders/', self.order_user(options['user']), unpaginated)),
+        ]
+        for path, data in payloads:
+            slow_ms, slow_body = self.time_render(JSONRenderer(), data, options['repeat'])
+            fast_ms, fast_body = self.time_render(FastJSONRenderer(), data, options['repeat'])
+            if fast_body != slow_body:
+                raise CommandError(f'{path}: FastJSONRenderer output differs from JSONRenderer')
+            gzipped = len(compress_string(fast_body))
+            self.stdout.write(
+                f'{path}: json {slow_ms:.3f}ms, orjson {fast_ms:.3f}ms ({slow_ms / fast_ms:.1f}x); '
+                f'{len(fast_body)} bytes, {gzipped} gzipped ({gzipped / len(fast_body):.0%})'
+            )
@@ -0,0 +1,78 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import CustomUser
+from store.archive import archivable_orders
+from store.models import Category
+from api.views import CategoryListView, OrderListView, ProductListView
+
+FULL_SCAN = re.compile(r'^SCAN \w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class Command(BaseCommand):
+    help = ('Run the queries behind each list endpoint and filter combination, and the batch '
+            'queries of maintenance commands, through EXPLAIN QUERY PLAN and fail on full table '
+            'scans or temporary sorts')
+
+    def product_cases(self):
+        category = Category.objects.order_by('pk').values_list('pk', flat=True).first() or 1
+        filters = [{}, {'category': category}, {'color': 'black'}, {'material': 'wood'}, {'featured': 'true'}]
+        for params in filters:
+            for ordering in ['-created_at', 'price', 'name']:
+                yield ProductListView, dict(params, ordering=ordering)
+
+    def cases(self):
+        yield from self.product_cases()
+        yield CategoryListView, {}
+        yield OrderListView, {}
+        yield OrderListView, {'view': 'summary'}
+        yield OrderListView, {'archived': 'true'}
+
+    def maintenance_queries(self):
+        yield 'archive_orders batch', archivable_orders()
+
+    def build_queryset(self, view_class, params):
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = CustomUser(pk=1)
+        view = view_class(request=request, format_kwarg=None, kwargs={}, args=())
+        return view.filter_queryset(view.get_queryset())
+
+    def explain(self, queryset):
+        sql, params = queryset[:10].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def check_plan(self, name, queryset):
+        plan = self.explain(queryset)
+        bad = [step for step in plan if FULL_SCAN.match(step) or TEMP_SORT in step]
+        if bad:
+            self.stdout.write(self.style.ERROR(f'FAIL {name}: {"; ".join(bad)}'))
+        elif self.verbosity > 1:
+            self.stdout.write(f'ok   {name}: {"; ".join(plan)}')
+        return bool(bad)
+
+    def check_cases(self, label):
+        failures = 0
+        for view_class, params in self.cases():
+            failures += self.check_plan(f'{label}{view_class.__name__} {params}', self.build_queryset(view_class, params))
+        return failures
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans only understands SQLite query plans')
+        self.verbosity = options['verbosity']
+        failures = self.check_cases('')
+        for name, queryset in self.maintenance_queries():
+            failures += self.check_plan(name, queryset)
+        with override_settings(PRODUCT_LISTING_READ_MODEL=True):
+            failures += self.check_cases('[listing] ')
+        if failures:
+            raise CommandError(f'{failures} queries scan a full table or sort in a temp B-tree')
+        self.stdout.write(self.style.SUCCESS('All list and maintenance queries use indexes'))
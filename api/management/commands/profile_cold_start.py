@@ -0,0 +1,108 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from store.models import Product
+
+# Runs in a fresh interpreter per endpoint so every measurement starts cold.
+PROBE = r'''
+import json, sys, time
+args = json.loads(sys.argv[1])
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+import furniture_store.urls  # noqa: F401
+urls_done = time.perf_counter()
+warm_up = 0.0
+if args['warm']:
+    from api.warmup import warm_up as run_warm_up
+    run_warm_up(catalog=args['catalog'])
+    warm_up = time.perf_counter() - urls_done
+from django.test import Client
+client = Client(HTTP_HOST=args['host'])
+if args['user']:
+    from accounts.models import CustomUser
+    client.force_login(CustomUser.objects.get(pk=args['user']))
+requests = []
+for _ in range(2):
+    request_started = time.perf_counter()
+    status = client.get(args['path']).status_code
+    requests.append(time.perf_counter() - request_started)
+print(json.dumps({
+    'setup': setup_done - started, 'urls': urls_done - setup_done, 'warm_up': warm_up,
+    'first': requests[0], 'second': requests[1], 'status': status,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Measure Django setup and URLconf import time and the first- and second-request '
+            'latency of each API endpoint, each in a fresh process')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Endpoints to probe (default: the main API endpoints)')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes per endpoint; medians are reported')
+        parser.add_argument('--warm', action='store_true', help='Run api.warmup.warm_up() before the first request')
+        parser.add_argument('--no-catalog', action='store_true', help='With --warm, skip loading the catalog indexes')
+        parser.add_argument('--user', help='Username for endpoints that need a login (default: first superuser)')
+        parser.add_argument('--max-first-ms', type=float,
+                            help='Fail if any median first-request latency exceeds this many milliseconds')
+
+    def default_paths(self, product_id):
+        paths = ['/api/', '/api/categories/', '/api/products/', '/api/autocomplete/?q=ch']
+        if product_id is not None:
+            paths += [f'/api/products/{product_id}/', f'/api/products/{product_id}/similar/']
+        return paths + ['/api/cart/', '/api/orders/']
+
+    def host(self):
+        for host in settings.ALLOWED_HOSTS:
+            if host != '*':
+                return host.lstrip('.')
+        return 'localhost'
+
+    def probe(self, path, user_id, options):
+        args = {
+            'path': path, 'user': user_id, 'host': self.host(),
+            'warm': options['warm'], 'catalog': not options['no_catalog'],
+        }
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, json.dumps(args)],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'{path}: probe failed\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'No user {options["user"]!r}')
+        else:
+            user = CustomUser.objects.filter(is_superuser=True).order_by('pk').first()
+        product_id = Product.objects.filter(is_available=True).order_by('pk').values_list('pk', flat=True).first()
+        paths = options['paths'] or self.default_paths(product_id)
+
+        self.stdout.write(f'{"endpoint":<32} {"status":>6} {"setup":>8} {"urls":>8} {"warm-up":>8} '
+                          f'{"first":>8} {"second":>8}')
+        slow = []
+        for path in paths:
+            needs_login = path.startswith(('/api/cart/', '/api/orders/', '/api/profile/'))
+            runs = [self.probe(path, user.pk if needs_login and user else None, options)
+                    for _ in range(options['runs'])]
+            median = {key: statistics.median(run[key] for run in runs) * 1000
+                      for key in ('setup', 'urls', 'warm_up', 'first', 'second')}
+            self.stdout.write(
+                f'{path:<32} {runs[-1]["status"]:>6} {median["setup"]:>6.1f}ms {median["urls"]:>6.1f}ms '
+                f'{median["warm_up"]:>6.1f}ms {median["first"]:>6.1f}ms {median["second"]:>6.1f}ms'
+            )
+            if options['max_first_ms'] is not None and median['first'] > options['max_first_ms']:
+                slow.append(path)
+        if slow:
+            raise CommandError(f'First request slower than {options["max_first_ms"]}ms: {", ".join(slow)}')
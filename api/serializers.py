@@ -1,8 +1,18 @@
 from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from accounts.models import CustomUser
-from store.models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem
+from store.models import (
+    Category, Product, ProductImage, ProductListing, Cart, CartItem, Order, OrderItem, InventoryMovement
+)
+from store import inventory, reservations
+from .fieldsets import DynamicFieldsMixin, RequestedShape
+from .fragments import FragmentCacheMixin
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -27,8 +37,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password2')
-        user = CustomUser.objects.create_user(**validated_data)
-        Cart.objects.create(user=user)
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(**validated_data)
+            Cart.objects.create(user=user)
+            user.auth_token = Token.objects.create(user=user)
         return user
 
 
@@ -53,34 +65,78 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(FragmentCacheMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     product_count = serializers.SerializerMethodField()
 
+    # Product availability changes don't touch the category row.
+    volatile_fields = ('product_count',)
+
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'image', 'is_active', 'product_count', 'created_at']
 
+    @staticmethod
+    def annotate_product_count(queryset):
+        # A correlated subquery rather than Count() keeps the query free of GROUP BY,
+        # which would drop Category's default ordering.
+        counts = (Product.objects.filter(category=OuterRef('pk'), is_available=True)
+                  .order_by().values('category').annotate(total=Count('pk')).values('total'))
+        return queryset.annotate(available_product_count=Coalesce(Subquery(counts), 0))
+
     def get_product_count(self, obj):
+        if hasattr(obj, 'available_product_count'):
+            return obj.available_product_count
         return obj.products.filter(is_available=True).count()
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(FragmentCacheMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductImage
         fields = ['id', 'image', 'is_primary']
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(FragmentCacheMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     primary_image = serializers.SerializerMethodField()
 
+    expandable_fields = {
+        'category': lambda: CategorySerializer(read_only=True),
+        'images': lambda: ProductImageSerializer(many=True, read_only=True),
+    }
+
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'category', 'category_name', 'price', 'stock', 'is_available', 
                  'featured', 'color', 'material', 'primary_image']
 
+    @staticmethod
+    def setup_eager_loading(queryset, shape=None, path='', lookup=''):
+        """Load only the relations the requested ``shape`` will render.
+
+        ``path`` is where the product sits in the response (e.g. ``items.product.``)
+        and ``lookup`` how ``queryset`` reaches it (e.g. ``product__``).
+        """
+        shape = shape or RequestedShape()
+        if shape.expands(f'{path}category'):
+            categories = Category.objects.all()
+            if shape.includes(f'{path}category.product_count'):
+                categories = CategorySerializer.annotate_product_count(categories)
+            queryset = queryset.prefetch_related(Prefetch(f'{lookup}category', queryset=categories))
+        elif shape.includes(f'{path}category_name'):
+            queryset = queryset.select_related(f'{lookup}category')
+        if shape.includes(f'{path}primary_image'):
+            queryset = queryset.prefetch_related(Prefetch(
+                f'{lookup}images', queryset=ProductImage.objects.filter(is_primary=True), to_attr='primary_images'
+            ))
+        if shape.expands(f'{path}images'):
+            queryset = queryset.prefetch_related(f'{lookup}images')
+        return queryset
+
     def get_primary_image(self, obj):
-        primary = obj.images.filter(is_primary=True).first()
+        if hasattr(obj, 'primary_images'):
+            primary = obj.primary_images[0] if obj.primary_images else None
+        else:
+            primary = obj.images.filter(is_primary=True).first()
         if primary:
             request = self.context.get('request')
             if request and primary.image:
@@ -88,7 +144,25 @@ class ProductListSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductListingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Same representation as ProductListSerializer, read from the ProductListing table."""
+    id = serializers.IntegerField(source='product_id', read_only=True)
+    category = serializers.IntegerField(source='category_id', read_only=True)
+    primary_image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductListing
+        fields = ['id', 'name', 'slug', 'category', 'category_name', 'price', 'stock', 'is_available', 
+                 'featured', 'color', 'material', 'primary_image']
+
+    def get_primary_image(self, obj):
+        request = self.context.get('request')
+        if request and obj.primary_image:
+            return request.build_absolute_uri(default_storage.url(obj.primary_image))
+        return None
+
+
+class ProductDetailSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     in_stock = serializers.BooleanField(read_only=True)
@@ -99,8 +173,20 @@ class ProductDetailSerializer(serializers.ModelSerializer):
                  'is_available', 'featured', 'color', 'material', 'in_stock', 'images', 
                  'created_at', 'updated_at']
 
+    @staticmethod
+    def setup_eager_loading(queryset, shape=None):
+        shape = shape or RequestedShape()
+        if shape.includes('category'):
+            categories = Category.objects.all()
+            if shape.includes('category.product_count'):
+                categories = CategorySerializer.annotate_product_count(categories)
+            queryset = queryset.prefetch_related(Prefetch('category', queryset=categories))
+        if shape.includes('images'):
+            queryset = queryset.prefetch_related('images')
+        return queryset
 
-class CartItemSerializer(serializers.ModelSerializer):
+
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     total_price = serializers.DecimalField(source='get_total_price', max_digits=10, decimal_places=2, read_only=True)
@@ -119,7 +205,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         return value
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.DecimalField(source='get_total_price', max_digits=10, decimal_places=2, read_only=True)
     total_items = serializers.IntegerField(source='get_total_items', read_only=True)
@@ -130,18 +216,35 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'items', 'total_price', 'total_items', 'total_items_count', 'updated_at']
         read_only_fields = ['user']
 
-
-class OrderItemSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def item_queryset(shape=None):
+        """Cart items loaded with just what the requested ``shape`` renders."""
+        shape = shape or RequestedShape()
+        queryset = CartItem.objects.all()
+        if shape.includes('items.product') or any(
+            shape.includes(name) for name in ('total_price', 'total_items_count', 'items.total_price')
+        ):
+            queryset = queryset.select_related('product')
+        if shape.includes('items.product'):
+            queryset = ProductListSerializer.setup_eager_loading(queryset, shape, 'items.product.', 'product__')
+        return queryset
+
+
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     total_price = serializers.DecimalField(source='get_total_price', max_digits=10, decimal_places=2, read_only=True)
 
+    expandable_fields = {
+        'product': lambda: ProductListSerializer(read_only=True),
+    }
+
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'product_name', 'quantity', 'price', 'total_price']
         read_only_fields = ['price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     user = serializers.CharField(source='user.username', read_only=True)
 
@@ -151,6 +254,52 @@ class OrderSerializer(serializers.ModelSerializer):
                  'phone', 'notes', 'items', 'created_at', 'updated_at']
         read_only_fields = ['order_number', 'user', 'total_amount']
 
+    @staticmethod
+    def setup_eager_loading(queryset, shape=None):
+        shape = shape or RequestedShape()
+        if shape.includes('user'):
+            queryset = queryset.select_related('user')
+        if shape.includes('items'):
+            # OrderItem, or ArchivedOrderItem for archived orders.
+            items = queryset.model._meta.get_field('items').related_model.objects.all()
+            if shape.expands('items.product'):
+                items = ProductListSerializer.setup_eager_loading(
+                    items.select_related('product'), shape, 'items.product.', 'product__'
+                )
+            elif shape.includes('items.product_name'):
+                items = items.select_related('product')
+            queryset = queryset.prefetch_related(Prefetch('items', queryset=items))
+        return queryset
+
+
+class OrderSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Compact order history entry, computed from annotations without loading order lines."""
+    item_count = serializers.IntegerField(source='summary_item_count', read_only=True)
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = ['id', 'order_number', 'status', 'total_amount', 'item_count', 'thumbnail', 'created_at']
+
+    @staticmethod
+    def setup_eager_loading(queryset, shape=None):
+        shape = shape or RequestedShape()
+        items = queryset.model._meta.get_field('items').related_model.objects.filter(order=OuterRef('pk'))
+        if shape.includes('item_count'):
+            quantities = items.order_by().values('order').annotate(total=Sum('quantity')).values('total')
+            queryset = queryset.annotate(summary_item_count=Coalesce(Subquery(quantities), 0))
+        if shape.includes('thumbnail'):
+            # Primary image of the first line whose product has one.
+            thumbnail = items.filter(product__images__is_primary=True).order_by('id').values('product__images__image')[:1]
+            queryset = queryset.annotate(thumbnail_name=Subquery(thumbnail))
+        return queryset
+
+    def get_thumbnail(self, obj):
+        request = self.context.get('request')
+        if request and obj.thumbnail_name:
+            return request.build_absolute_uri(default_storage.url(obj.thumbnail_name))
+        return None
+
 
 class CreateOrderSerializer(serializers.ModelSerializer):
     class Meta:
@@ -159,17 +308,19 @@ class CreateOrderSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         request = self.context.get('request')
-        if not request.user.cart.items.exists():
+        if not CartItem.objects.filter(cart__user=request.user).exists():
             raise serializers.ValidationError("Your cart is empty.")
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         user = request.user
         cart = user.cart
+        cart_items = list(cart.items.select_related('product'))
         
         # Calculate total amount
-        total_amount = cart.get_total_price()
+        total_amount = sum(item.get_total_price() for item in cart_items)
         
         # Create order
         order = Order.objects.create(
@@ -179,17 +330,26 @@ class CreateOrderSerializer(serializers.ModelSerializer):
         )
         
         # Create order items from cart items
-        for cart_item in cart.items.all():
+        for cart_item in cart_items:
             OrderItem.objects.create(
                 order=order,
                 product=cart_item.product,
                 quantity=cart_item.quantity,
                 price=cart_item.product.price
             )
-            
-            # Update product stock
-            cart_item.product.stock -= cart_item.quantity
-            cart_item.product.save()
+        
+        # Update product stock, allocating the lines across warehouses
+        try:
+            if reservations.reservations_enabled():
+                reservations.convert(cart, cart_items, order=order)
+            else:
+                inventory.apply_movements([
+                    InventoryMovement(product_id=cart_item.product_id, kind=InventoryMovement.SALE,
+                                      quantity=-cart_item.quantity, order=order)
+                    for cart_item in cart_items
+                ])
+        except inventory.InsufficientStock as exc:
+            raise serializers.ValidationError(f"Insufficient stock for {exc.product.name}.")
         
         # Clear cart
         cart.items.all().delete()
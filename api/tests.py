@@ -1,3 +1,45 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.throttling import AuthThrottle
+from store.models import Cart, Category, Product, StockReservation
+
+
+@override_settings(THROTTLING=False)
+class AddToCartTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Tables')
+        self.product = Product.objects.create(
+            name='Table', category=category, description='A table', price=Decimal('120.00'), stock=5,
+        )
+        self.client = APIClient()
+
+    def post(self, quantity):
+        return self.client.post('/api/cart/add/', {'product_id': self.product.pk, 'quantity': quantity}, format='json')
+
+    def test_rejects_bad_quantities(self):
+        self.client.force_authenticate(get_user_model().objects.create_user('buyer', 'buyer@example.com', 'secret'))
+        for quantity in (0, -3, 'two', None):
+            self.assertEqual(self.post(quantity).status_code, 400, quantity)
+        self.assertFalse(Cart.objects.filter(items__isnull=False).exists())
+
+    @override_settings(STOCK_RESERVATIONS=True)
+    def test_rejects_bad_quantities_without_holding_stock(self):
+        self.client.force_authenticate(get_user_model().objects.create_user('buyer', 'buyer@example.com', 'secret'))
+        self.assertEqual(self.post(-3).status_code, 400)
+        self.assertEqual(self.post(2).status_code, 201)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+
+    def test_rejects_bad_guest_quantities(self):
+        for quantity in (0, -3, 'two'):
+            self.assertEqual(self.post(quantity).status_code, 400, quantity)
+        self.assertEqual(self.post(2).status_code, 201)
+
+
+class ThrottleIdentTests(TestCase):
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        request = APIRequestFactory().post('/api/login/', HTTP_X_FORWARDED_FOR='203.0.113.9', REMOTE_ADDR='198.51.100.1')
+        self.assertEqual(AuthThrottle().get_ident_key(request, None), '198.51.100.1')
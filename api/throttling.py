@@ -0,0 +1,150 @@
+"""Token-bucket rate limits kept in a shared cache.
+
+Each bucket is one cache key holding its "theoretical arrival time" (GCRA):
+the moment the bucket would be full again, in microseconds. Taking a token
+is a single atomic ``incr`` by the refill interval; the request is let
+through while that time is at most ``burst`` intervals ahead of now, and
+otherwise the ``incr`` is undone with ``decr`` and the difference is the
+``Retry-After``. Concurrent requests can race only when a bucket is new or
+has refilled completely, and then at worst one extra request gets through.
+
+Budgets come from ``THROTTLE_RATES`` (``scope: (tokens per second, burst)``)
+and live in the ``THROTTLE_CACHE_ALIAS`` cache, which must be shared by all
+workers (memcached or Redis) for the limits to be global; the database
+cache's ``incr`` is not atomic.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import BaseThrottle
+
+from furniture_store import metrics
+
+MICROSECONDS = 1_000_000
+# Keys outlive their bucket by at least this long; see bucket_timeout().
+MIN_KEY_TIMEOUT = 60 * 60
+# Backends that keep a bucket per process, drop it, or increment it without atomicity.
+UNSHARED_CACHES = (LocMemCache, DummyCache, DatabaseCache, FileBasedCache)
+
+
+def throttling_enabled():
+    return getattr(settings, 'THROTTLING', True)
+
+
+def throttle_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+
+def throttle_rates():
+    return getattr(settings, 'THROTTLE_RATES', {})
+
+
+def check_throttle_cache(app_configs, **kwargs):
+    """Warn when rate limits are on but their cache can't enforce them across workers."""
+    if not throttling_enabled() or not throttle_rates():
+        return []
+    alias = getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+    backend = throttle_cache()
+    if not isinstance(backend, UNSHARED_CACHES):
+        return []
+    return [checks.Warning(
+        f'THROTTLE_CACHE_ALIAS {alias!r} uses {type(backend).__name__}, which is per process or '
+        f'has no atomic incr, so every worker enforces its own rate limits.',
+        hint='Point THROTTLE_CACHE_ALIAS at a memcached or Redis cache, or set THROTTLING = False.',
+        id='api.W001',
+    )]
+
+
+def bucket_timeout(tolerance):
+    """Cache timeout (seconds) for a bucket that drains in ``tolerance`` microseconds.
+
+    ``incr`` keeps a key's original expiry, so a bucket in constant use
+    is reset when its key expires, granting one extra burst per timeout.
+    """
+    return max(MIN_KEY_TIMEOUT, 10 * math.ceil(tolerance / MICROSECONDS))
+
+
+def take(key, rate, burst, now=None):
+    """Take a token from the bucket at ``key``.
+
+    Returns None when the request may proceed, otherwise the seconds until
+    a token is available.
+    """
+    cache = throttle_cache()
+    interval = max(1, round(MICROSECONDS / rate))
+    tolerance = interval * burst
+    now = round((time.time() if now is None else now) * MICROSECONDS)
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        arrival = None
+    if arrival is None or arrival - interval < now:
+        # New or completely refilled bucket: start over from now.
+        cache.set(key, now + interval, bucket_timeout(tolerance))
+        return None
+    if arrival - now <= tolerance:
+        return None
+    cache.decr(key, interval)
+    return (arrival - now - tolerance) / MICROSECONDS
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Limits requests to the ``scope`` budget from ``THROTTLE_RATES``.
+
+    Subclasses set ``scope`` and decide what the bucket is keyed on in
+    ``get_ident_key``; returning None exempts the request.
+    """
+    scope = None
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        budget = throttle_rates().get(self.scope)
+        if not budget or not throttling_enabled():
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        rate, burst = budget
+        self.retry_after = take(f'throttle:{self.scope}:{ident}', rate, burst)
+        if self.retry_after is None:
+            return True
+        metrics.THROTTLED.inc(scope=self.scope)
+        return False
+
+    def wait(self):
+        return self.retry_after
+
+
+class CatalogThrottle(TokenBucketThrottle):
+    """Anonymous catalog reads, per client address; signed-in users are not limited."""
+    scope = 'catalog'
+
+    def get_ident_key(self, request, view):
+        if request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class CartThrottle(TokenBucketThrottle):
+    """Cart changes and checkout, per user (per client address for guest carts)."""
+    scope = 'cart'
+
+    def get_ident_key(self, request, view):
+        if request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return self.get_ident(request)
+
+
+class AuthThrottle(TokenBucketThrottle):
+    """Login and registration attempts, per client address."""
+    scope = 'auth'
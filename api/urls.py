@@ -3,9 +3,12 @@ from .views import (
     api_root,
     RegisterView, LoginView, ProfileView,
     CategoryListView, CategoryDetailView,
-    ProductListView, ProductDetailView,
+    ProductListView, ProductDetailView, ProductBatchView, ProductRecommendationsView, SimilarProductsView,
+    ProductImageBulkUploadView,
+    autocomplete_view,
     CartView, add_to_cart, remove_from_cart,
-    OrderListView, OrderDetailView, CreateOrderView
+    OrderListView, OrderDetailView, CreateOrderView,
+    profile_list, profile_detail, profile_collapsed,
 )
 
 app_name = 'api'
@@ -26,6 +29,11 @@ urlpatterns = [
     # Products
     path('products/', ProductListView.as_view(), name='product-list'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
+    path('products/batch/', ProductBatchView.as_view(), name='product-batch'),
+    path('products/images/bulk/', ProductImageBulkUploadView.as_view(), name='product-images-bulk'),
+    path('products/<int:pk>/recommendations/', ProductRecommendationsView.as_view(), name='product-recommendations'),
+    path('products/<int:pk>/similar/', SimilarProductsView.as_view(), name='product-similar'),
+    path('autocomplete/', autocomplete_view, name='autocomplete'),
     
     # Cart
     path('cart/', CartView.as_view(), name='cart'),
@@ -36,4 +44,9 @@ urlpatterns = [
     path('orders/', OrderListView.as_view(), name='order-list'),
     path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/create/', CreateOrderView.as_view(), name='create-order'),
+
+    # Request profiles (staff)
+    path('profiles/', profile_list, name='profile-list'),
+    path('profiles/<str:profile_id>/', profile_detail, name='profile-detail'),
+    path('profiles/<str:profile_id>/collapsed/', profile_collapsed, name='profile-collapsed'),
 ]
\ No newline at end of file
@@ -1,19 +1,28 @@
 from rest_framework import generics, status, permissions, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.authtoken.models import Token
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, prefetch_related_objects
 from django_filters.rest_framework import DjangoFilterBackend
 from django.urls import reverse
+from django.conf import settings
 
 from accounts.models import CustomUser
-from store.models import Category, Product, Cart, CartItem, Order
+from furniture_store import metrics, profiling
+from store.models import ArchivedOrder, Category, Product, ProductListing, Cart, CartItem, Order
+from store import autocomplete, carts, images, reservations, similarity
 from .serializers import (
     CustomUserSerializer, UserRegistrationSerializer, LoginSerializer,
-    CategorySerializer, ProductListSerializer, ProductDetailSerializer,
-    CartSerializer, CartItemSerializer, OrderSerializer, CreateOrderSerializer
+    CategorySerializer, ProductImageSerializer, ProductListSerializer, ProductListingSerializer, ProductDetailSerializer,
+    CartSerializer, CartItemSerializer, OrderSerializer, OrderSummarySerializer, CreateOrderSerializer
 )
+from . import guest_cart
+from .throttling import AuthThrottle, CartThrottle, CatalogThrottle
+from .fieldsets import RequestedShape
 
 
 # API Root View
@@ -35,6 +44,11 @@ def api_root(request):
             'products': {
                 'list': request.build_absolute_uri('/api/products/'),
                 'detail': request.build_absolute_uri('/api/products/<id>/'),
+                'batch': request.build_absolute_uri('/api/products/batch/?ids=<id>,<id>'),
+                'bulk_images': request.build_absolute_uri('/api/products/images/bulk/'),
+                'recommendations': request.build_absolute_uri('/api/products/<id>/recommendations/'),
+                'similar': request.build_absolute_uri('/api/products/<id>/similar/'),
+                'autocomplete': request.build_absolute_uri('/api/autocomplete/?q=<prefix>'),
             },
             'cart': {
                 'view': request.build_absolute_uri('/api/cart/'),
@@ -52,24 +66,35 @@ def api_root(request):
 
 
 # User Authentication Views
+def merge_guest_cart(request, user, response):
+    """Move the request's guest cart, if any, into ``user``'s cart and drop the cookie."""
+    quantities = guest_cart.read(request)
+    if not quantities:
+        return response
+    carts.merge_items(user, quantities)
+    return guest_cart.clear(response)
+
+
 class RegisterView(generics.CreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [AuthThrottle]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
-        return Response({
+        response = Response({
             'user': CustomUserSerializer(user).data,
-            'token': token.key
+            'token': user.auth_token.key
         }, status=status.HTTP_201_CREATED)
+        return merge_guest_cart(request, user, response)
 
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [AuthThrottle]
     serializer_class = LoginSerializer
 
     def post(self, request):
@@ -77,10 +102,11 @@ class LoginView(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         token, created = Token.objects.get_or_create(user=user)
-        return Response({
+        response = Response({
             'user': CustomUserSerializer(user).data,
             'token': token.key
         })
+        return merge_guest_cart(request, user, response)
 
 
 class ProfileView(generics.RetrieveUpdateAPIView):
@@ -92,16 +118,26 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 
 
 # Category Views
-class CategoryListView(generics.ListAPIView):
+class CategoryQuerysetMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if RequestedShape.from_request(self.request).includes('product_count'):
+            queryset = CategorySerializer.annotate_product_count(queryset)
+        return queryset
+
+
+class CategoryListView(CategoryQuerysetMixin, generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
 
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(CategoryQuerysetMixin, generics.RetrieveAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
 
 
 # Product Views
@@ -109,31 +145,214 @@ class ProductListView(generics.ListAPIView):
     queryset = Product.objects.filter(is_available=True)
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'color', 'material', 'featured']
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'created_at', 'name']
     ordering = ['-created_at']
 
+    def use_listing(self):
+        # Search also matches the description and expansions need related
+        # rows, neither of which the listing table has.
+        return (getattr(settings, 'PRODUCT_LISTING_READ_MODEL', False)
+                and not self.request.query_params.get('search')
+                and not self.request.query_params.get('expand'))
+
+    def get_queryset(self):
+        if self.use_listing():
+            return ProductListing.objects.filter(is_available=True)
+        return ProductListSerializer.setup_eager_loading(
+            super().get_queryset(), RequestedShape.from_request(self.request)
+        )
+
+    def get_serializer_class(self):
+        if self.use_listing():
+            return ProductListingSerializer
+        return super().get_serializer_class()
+
 
 class ProductDetailView(generics.RetrieveAPIView):
     queryset = Product.objects.filter(is_available=True)
     serializer_class = ProductDetailSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
+
+    def get_queryset(self):
+        return ProductDetailSerializer.setup_eager_loading(
+            super().get_queryset(), RequestedShape.from_request(self.request)
+        )
+
+
+class ProductBatchView(APIView):
+    """Look up many products at once by ``?ids=1,2,3`` or ``?slugs=a,b,c``.
+
+    Results keep the requested order; ids or slugs that don't exist are
+    listed under ``missing`` and existing but unavailable ones under
+    ``unavailable``.
+    """
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
+    max_batch_size = 200
+
+    def get(self, request):
+        ids = request.query_params.get('ids')
+        slugs = request.query_params.get('slugs')
+        if bool(ids) == bool(slugs):
+            return Response({'error': 'Provide either ids or slugs'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if ids:
+            field = 'pk'
+            try:
+                keys = [int(value) for value in ids.split(',') if value.strip()]
+            except ValueError:
+                return Response({'error': 'ids must be comma-separated integers'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            field = 'slug'
+            keys = [value.strip() for value in slugs.split(',') if value.strip()]
+        keys = list(dict.fromkeys(keys))
+        if len(keys) > self.max_batch_size:
+            return Response({'error': f'At most {self.max_batch_size} products per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = ProductListSerializer.setup_eager_loading(
+            Product.objects.filter(**{f'{field}__in': keys}), RequestedShape.from_request(request)
+        )
+        found = {getattr(product, field): product for product in queryset}
+        products = [found[key] for key in keys if key in found and found[key].is_available]
+        serializer = ProductListSerializer(products, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'missing': [key for key in keys if key not in found],
+            'unavailable': [key for key in keys if key in found and not found[key].is_available],
+        })
+
+
+class ProductRecommendationsView(generics.ListAPIView):
+    """Products frequently bought together with the given one, best first."""
+    serializer_class = ProductListSerializer
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
+    pagination_class = None
+
+    def get_queryset(self):
+        queryset = Product.objects.filter(
+            is_available=True, recommended_for__product_id=self.kwargs['pk']
+        ).order_by('recommended_for__rank')
+        return ProductListSerializer.setup_eager_loading(queryset, RequestedShape.from_request(self.request))
+
+
+class SimilarProductsView(generics.ListAPIView):
+    """Products closest to the given one by category, color, material and price.
+
+    Query parameters: ``k`` (default 10, at most 50) and ``metric``
+    (``cosine`` or ``euclidean``).
+    """
+    serializer_class = ProductListSerializer
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [CatalogThrottle]
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        metric = request.query_params.get('metric', 'cosine')
+        if metric not in similarity.METRICS:
+            return Response({'error': 'metric must be cosine or euclidean'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'k must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = similarity.similar_products(self.kwargs['pk'], k=k, metric=metric)
+        if ids is None:
+            return Response({'error': 'Product not found or unavailable'}, status=status.HTTP_404_NOT_FOUND)
+        queryset = ProductListSerializer.setup_eager_loading(
+            Product.objects.filter(pk__in=ids, is_available=True), RequestedShape.from_request(request)
+        )
+        products = {product.pk: product for product in queryset}
+        serializer = self.get_serializer([products[pk] for pk in ids if pk in products], many=True)
+        return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@throttle_classes([CatalogThrottle])
+def autocomplete_view(request):
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'query': query, 'suggestions': autocomplete.suggest(query, limit)})
+
+
+class ProductImageBulkUploadView(APIView):
+    """Attach many images to one or many products (staff only).
+
+    Multipart fields: ``images`` (any number of files for ``product``),
+    ``archive`` (zip files whose folders are named after product ids or
+    slugs, or bare files for ``product``), ``product`` (id or slug) and
+    ``primary`` (comma-separated file names to make primary). Invalid
+    images are reported under ``errors``; the rest are saved.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        product = request.data.get('product') or None
+        primary = {name.strip() for name in request.data.get('primary', '').split(',') if name.strip()}
+        uploads = []
+        try:
+            for upload in request.FILES.getlist('images'):
+                if product is None:
+                    return Response({'error': 'product is required when uploading images'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if upload.size > images.max_file_size():
+                    raise images.ImageRejected(f'{upload.name} is larger than {images.max_file_size()} bytes')
+                uploads.append(images.ImageUpload(product, upload.name, upload.read(), primary=upload.name in primary))
+            for archive in request.FILES.getlist('archive'):
+                uploads.extend(images.read_zip(archive, product, primary))
+            if not uploads:
+                return Response({'error': 'No images uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+            created, errors = images.import_images(uploads)
+        except images.ImageRejected as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request}
+        return Response({
+            'created': [dict(ProductImageSerializer(image, context=context).data, product=image.product_id)
+                        for image in created],
+            'errors': [{'file': name, 'error': message} for name, message in errors],
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
 
 
 # Cart Views
 class CartView(generics.RetrieveAPIView):
+    """The user's cart, or the guest cart from the cookie for anonymous visitors."""
     serializer_class = CartSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [guest_cart.CartPermission]
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().retrieve(request, *args, **kwargs)
+        stored = guest_cart.read(request)
+        quantities, products = guest_cart.load(stored, RequestedShape.from_request(request))
+        cart = guest_cart.GuestCart(guest_cart.items(quantities, products))
+        response = Response(self.get_serializer(cart).data)
+        if quantities != stored:
+            guest_cart.write(response, quantities)
+        return response
 
     def get_object(self):
         cart, created = Cart.objects.get_or_create(user=self.request.user)
+        shape = RequestedShape.from_request(self.request)
+        if any(shape.includes(name) for name in ('items', 'total_price', 'total_items', 'total_items_count')):
+            prefetch_related_objects([cart], Prefetch('items', queryset=CartSerializer.item_queryset(shape)))
         return cart
 
 
 @api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
+@permission_classes([guest_cart.CartPermission])
+@throttle_classes([CartThrottle])
 def add_to_cart(request):
     product_id = request.data.get('product_id')
     quantity = request.data.get('quantity', 1)
@@ -141,15 +360,31 @@ def add_to_cart(request):
     if not product_id:
         return Response({'error': 'Product ID is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        return Response({'error': 'Quantity must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    if quantity < 1:
+        return Response({'error': 'Quantity must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         product = Product.objects.get(id=product_id, is_available=True)
     except Product.DoesNotExist:
         return Response({'error': 'Product not found or unavailable'}, status=status.HTTP_404_NOT_FOUND)
 
-    if product.stock < quantity:
-        return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+    if not request.user.is_authenticated:
+        return add_to_guest_cart(request, product, quantity)
 
     cart, created = Cart.objects.get_or_create(user=request.user)
+
+    if reservations.reservations_enabled():
+        if not reservations.reserve(cart, product, quantity):
+            metrics.OUT_OF_STOCK.inc(cart='user')
+            return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+    elif product.stock < quantity:
+        metrics.OUT_OF_STOCK.inc(cart='user')
+        return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+
     cart_item, created = CartItem.objects.get_or_create(
         cart=cart,
         product=product,
@@ -159,23 +394,57 @@ def add_to_cart(request):
     if not created:
         cart_item.quantity += quantity
         cart_item.save()
+    cart.save(update_fields=['updated_at'])
 
     serializer = CartItemSerializer(cart_item)
     return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 
+def add_to_guest_cart(request, product, quantity):
+    quantities = guest_cart.read(request)
+    quantity = quantities.get(product.pk, 0) + quantity
+    if product.pk not in quantities and len(quantities) >= guest_cart.max_items():
+        return Response({'error': 'Cart is full'}, status=status.HTTP_400_BAD_REQUEST)
+    if product.stock < quantity:
+        metrics.OUT_OF_STOCK.inc(cart='guest')
+        return Response({'error': 'Insufficient stock'}, status=status.HTTP_400_BAD_REQUEST)
+
+    created = product.pk not in quantities
+    quantities[product.pk] = quantity
+    serializer = CartItemSerializer(CartItem(product=product, quantity=quantity))
+    response = Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    return guest_cart.write(response, quantities)
+
+
+def remove_from_guest_cart(request, product_id):
+    quantities = guest_cart.read(request)
+    product_id = int(product_id) if str(product_id).isdigit() else None
+    if product_id not in quantities:
+        return Response({'error': 'Item not in cart'}, status=status.HTTP_404_NOT_FOUND)
+    del quantities[product_id]
+    response = Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
+    return guest_cart.write(response, quantities)
+
+
 @api_view(['POST'])
-@permission_classes([permissions.IsAuthenticated])
+@permission_classes([guest_cart.CartPermission])
+@throttle_classes([CartThrottle])
 def remove_from_cart(request):
     product_id = request.data.get('product_id')
     
     if not product_id:
         return Response({'error': 'Product ID is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    if not request.user.is_authenticated:
+        return remove_from_guest_cart(request, product_id)
+
     try:
         cart = request.user.cart
         cart_item = CartItem.objects.get(cart=cart, product_id=product_id)
         cart_item.delete()
+        cart.save(update_fields=['updated_at'])
+        if reservations.reservations_enabled():
+            reservations.release(cart, [cart_item.product_id])
         return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
     except Cart.DoesNotExist:
         return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -185,24 +454,90 @@ def remove_from_cart(request):
 
 # Order Views
 class OrderListView(generics.ListAPIView):
+    """The user's orders.
+
+    ``?view=summary`` returns OrderSummarySerializer entries and
+    ``?archived=true`` lists the orders moved to the archive instead.
+    """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        archived = self.request.query_params.get('archived', '').lower() in ('1', 'true', 'yes')
+        orders = ArchivedOrder.objects if archived else Order.objects
+        return self.get_serializer_class().setup_eager_loading(
+            orders.filter(user=self.request.user), RequestedShape.from_request(self.request)
+        )
+
+    def get_serializer_class(self):
+        if self.request.query_params.get('view') == 'summary':
+            return OrderSummarySerializer
+        return super().get_serializer_class()
 
 
 class OrderDetailView(generics.RetrieveAPIView):
+    """One of the user's orders, looked up in the archive when it has been moved there."""
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return OrderSerializer.setup_eager_loading(
+            Order.objects.filter(user=self.request.user), RequestedShape.from_request(self.request)
+        )
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            archived = OrderSerializer.setup_eager_loading(
+                ArchivedOrder.objects.filter(user=self.request.user), RequestedShape.from_request(self.request)
+            ).filter(pk=self.kwargs['pk']).first()
+            if archived is None:
+                raise
+            self.check_object_permissions(self.request, archived)
+            return archived
 
 
 class CreateOrderView(generics.CreateAPIView):
     serializer_class = CreateOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [CartThrottle]
+
+    def create(self, request, *args, **kwargs):
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            metrics.CHECKOUTS.inc(result='failure')
+            raise
+        metrics.CHECKOUTS.inc(result='success')
+        return response
 
     def perform_create(self, serializer):
         serializer.save()
+
+
+# Profiling Views
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_list(request):
+    """The newest stored request profiles (see furniture_store.profiling)."""
+    return Response(profiling.recent())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_detail(request, profile_id):
+    report = profiling.load(profile_id)
+    if report is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(report)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_collapsed(request, profile_id):
+    """Collapsed stacks for flamegraph.pl, speedscope or inferno."""
+    stacks = profiling.load_collapsed(profile_id)
+    if stacks is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return HttpResponse(stacks, content_type='text/plain; charset=utf-8')
@@ -0,0 +1,111 @@
+"""Pay the per-process first-request costs before a worker takes traffic.
+
+Called at the bottom of ``furniture_store/wsgi.py`` and ``asgi.py``, so it
+runs once in the gunicorn master with ``--preload`` (forked workers inherit
+the warmed state) or once per worker otherwise.
+"""
+import inspect
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve, reverse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def _route_paths():
+    from . import urls
+    for pattern in urls.urlpatterns:
+        kwargs = {name: 1 for name in pattern.pattern.converters}
+        yield reverse(f'{urls.app_name}:{pattern.name}', kwargs=kwargs)
+
+
+def resolve_routes():
+    """Compile every API route and the resolver's reverse lookup tables."""
+    views = []
+    for path in _route_paths():
+        view_class = getattr(resolve(path).func, 'view_class', None)
+        if view_class is not None:
+            views.append(view_class)
+    return views
+
+
+def _build_fields(serializer):
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    for field in serializer.fields.values():
+        if isinstance(field, BaseSerializer):
+            _build_fields(field)
+
+
+def build_serializers():
+    """Instantiate every API serializer and its nested fields once."""
+    from . import serializers
+    classes = [
+        cls for _, cls in inspect.getmembers(serializers, inspect.isclass)
+        if issubclass(cls, BaseSerializer) and cls.__module__ == serializers.__name__
+    ]
+    for cls in classes:
+        _build_fields(cls(context={}))
+    return classes
+
+
+def build_filtersets(views):
+    """Build the django-filter filtersets and forms of the filtered list views."""
+    built = []
+    for view_class in views:
+        if DjangoFilterBackend not in getattr(view_class, 'filter_backends', ()):
+            continue
+        queryset = view_class.queryset.none()
+        filterset_class = DjangoFilterBackend().get_filterset_class(view_class(), queryset)
+        if filterset_class is not None:
+            filterset_class(data={}, queryset=queryset).is_valid()
+            built.append(filterset_class)
+    return built
+
+
+def prime_catalog():
+    """Load the in-process similar-products and autocomplete indexes."""
+    from store import autocomplete, similarity
+    similarity.get_index()
+    autocomplete.get_index()
+
+
+def warm_up(catalog=True):
+    """Run every warm-up step and return ``{step: seconds}``.
+
+    A failing step is logged and skipped; warm-up never stops the worker
+    from starting. Database connections opened here are closed so that
+    forked workers don't share them.
+    """
+    timings = {}
+    views = []
+    steps = [
+        ('routes', lambda: views.extend(resolve_routes())),
+        ('serializers', build_serializers),
+        ('filtersets', lambda: build_filtersets(views)),
+    ]
+    if catalog:
+        steps.append(('catalog', prime_catalog))
+    try:
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception('Warm-up step %s failed', name)
+            timings[name] = time.perf_counter() - started
+    finally:
+        connections.close_all()
+    return timings
+
+
+def warm_up_on_startup():
+    if getattr(settings, 'WARMUP_ON_STARTUP', False):
+        timings = warm_up(catalog=getattr(settings, 'WARMUP_CATALOG', True))
+        logger.info('Warm-up finished: %s', ', '.join(f'{name} {seconds * 1000:.0f}ms'
+                                                      for name, seconds in timings.items()))
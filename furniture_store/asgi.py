@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'furniture_store.settings')
 
 application = get_asgi_application()
+
+# Imported after the app registry is ready.
+from api.warmup import warm_up_on_startup  # noqa: E402
+
+warm_up_on_startup()
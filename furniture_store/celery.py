@@ -0,0 +1,14 @@
+"""Celery app for the periodic maintenance tasks in ``store/tasks.py``.
+
+Not imported by the web processes; ``celery -A furniture_store`` finds it
+as ``furniture_store.celery``. Schedules are in ``CELERY_BEAT_SCHEDULE``.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'furniture_store.settings')
+
+app = Celery('furniture_store')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
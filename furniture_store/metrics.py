@@ -0,0 +1,206 @@
+"""In-process metrics in the Prometheus text format.
+
+Counters and histograms live in memory in each process. With
+``METRICS_DIR`` set, every process also writes a snapshot of its values to
+``<METRICS_DIR>/<pid>.json`` (at most every ``METRICS_FLUSH_INTERVAL``
+seconds and at exit), and the ``/metrics`` view sums the snapshots of all
+workers, so any worker can answer a scrape. Clear the directory when
+deploying.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def flush_interval():
+    return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {name: [[list(labels), list(value) if isinstance(value, list) else value]
+                           for labels, value in metric.values.items()]
+                    for name, metric in self.metrics.items()}
+
+    def flush(self):
+        """Write this process's snapshot to ``METRICS_DIR``, if set."""
+        directory = metrics_dir()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path, os.path.join(directory, f'{os.getpid()}.json'))
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if metrics_dir() and time.monotonic() - self.last_flush >= flush_interval():
+            self.flush()
+
+    def _snapshots(self):
+        directory = metrics_dir()
+        if not directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """All metrics, summed over every process's snapshot, in the text exposition format."""
+        totals = {}
+        for snapshot in self._snapshots():
+            for name, samples in snapshot.items():
+                merged = totals.setdefault(name, {})
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if key in merged:
+                        merged[key] = _add(merged[key], value)
+                    else:
+                        merged[key] = value
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for labels, value in sorted(totals.get(name, {}).items()):
+                lines.extend(metric.expose(dict(zip(metric.labelnames, labels)), value))
+        return '\n'.join(lines) + '\n'
+
+
+def _add(a, b):
+    if isinstance(a, list):
+        return [x + y for x, y in zip(a, b)]
+    return a + b
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self.values = {}
+        registry.register(self)
+
+    def _labels(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._labels(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def expose(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(buckets) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._labels(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self.registry.lock:
+            # Per-bucket counts followed by the running sum.
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0]
+            state[index] += 1
+            state[-1] += value
+
+    def expose(self, labels, value):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+# What the project records.
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by view, method and status.',
+                        ['view', 'method', 'status'])
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'Time spent handling requests, by view.', ['view'])
+DB_QUERIES = Histogram('http_request_db_queries', 'SQL queries run per request, by view.', ['view'],
+                       buckets=QUERY_COUNT_BUCKETS)
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result (hit or miss).',
+                         ['cache', 'result'])
+CHECKOUTS = Counter('checkouts_total', 'Order creation attempts by result (success or failure).', ['result'])
+OUT_OF_STOCK = Counter('cart_out_of_stock_total', 'add_to_cart requests rejected for insufficient stock.',
+                       ['cart'])
+THROTTLED = Counter('throttled_requests_total', 'Requests rejected by a rate limit, by scope.', ['scope'])
+
+
+@require_safe
+def metrics_view(request):
+    """Serve every metric; requires ``Authorization: Bearer <METRICS_TOKEN>`` when that is set."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
+
+from . import metrics, profiling
+
+
+class ThresholdGZipMiddleware(GZipMiddleware):
+    """``GZipMiddleware`` with a configurable minimum body size.
+
+    Compressing small API responses costs more CPU than it saves on the wire,
+    so bodies shorter than ``GZIP_MIN_LENGTH`` bytes are sent as they are.
+    Clients that don't send ``Accept-Encoding: gzip`` always get plain bodies.
+    File and partial-content responses (media) are never compressed, so they
+    keep their byte ranges and can still be sent with ``sendfile()``.
+    """
+
+    def process_response(self, request, response):
+        min_length = getattr(settings, 'GZIP_MIN_LENGTH', 1024)
+        if not response.streaming and len(response.content) < min_length:
+            return response
+        if response.status_code == 206 or getattr(response, 'file_to_stream', None) is not None:
+            return response
+        return super().process_response(request, response)
+
+
+class MetricsMiddleware:
+    """Record request counts, latency and SQL query counts per view in ``furniture_store.metrics``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        metrics.HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.HTTP_LATENCY.observe(elapsed, view=view)
+        metrics.DB_QUERIES.observe(queries, view=view)
+        metrics.REGISTRY.maybe_flush()
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile requests on demand for staff users, and a ``PROFILE_SAMPLE_RATE`` share of all requests.
+
+    See ``furniture_store.profiling``. On-demand profiles answer with an
+    ``X-Profile-Id`` header naming the stored report.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling.requested(request) and profiling.is_staff(request):
+            profile = profiling.RequestProfile(request, full=True)
+        elif profiling.sampled():
+            profile = profiling.RequestProfile(request, full=False)
+        else:
+            return self.get_response(request)
+        response = profile.run(self.get_response)
+        profile_id = profile.save(response)
+        if profile.full:
+            response['X-Profile-Id'] = profile_id
+        return response
@@ -0,0 +1,250 @@
+"""Per-request profiling for staff, and of a random sample of all requests.
+
+A profiled request collects the SQL it ran with timings and samples the
+handling thread's stack to build flamegraph-compatible collapsed stacks.
+Requests profiled on demand (``?profile=1`` or ``X-Profile: 1`` from a staff
+user) also run under cProfile. Reports go to ``PROFILE_DIR`` as
+``<id>.json`` plus ``<id>.collapsed``; only the newest ``PROFILE_KEEP``
+are kept.
+"""
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+TOP_FUNCTIONS = 40
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def keep():
+    return getattr(settings, 'PROFILE_KEEP', 200)
+
+
+def sample_rate():
+    return getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+
+
+def sample_interval():
+    return getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.001)
+
+
+def requested(request):
+    return request.GET.get('profile') in ('1', 'true') or request.headers.get('X-Profile') in ('1', 'true')
+
+
+def sampled():
+    rate = sample_rate()
+    return rate > 0 and random.random() < rate
+
+
+def is_staff(request):
+    """Whether the session or API token behind ``request`` belongs to a staff user."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.exceptions import AuthenticationFailed
+
+    try:
+        credentials = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(credentials and credentials[0].is_staff)
+
+
+@lru_cache(maxsize=None)
+def _frame_label(code):
+    filename = code.co_filename
+    for prefix in sorted({str(settings.BASE_DIR), *sys.path}, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """Counts the stacks of one thread, below its current frame, every ``interval`` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.base = sys._getframe(1)
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.base:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack and frame is self.base:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [{'function': function, 'samples': count, 'share': round(count / total, 4)}
+                for function, count in leaves.most_common(limit)]
+
+
+def _cprofile_top(profiler, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {'function': f'{name} ({filename}:{line})', 'calls': calls, 'primitive_calls': primitive,
+         'tottime_ms': round(tottime * 1000, 3), 'cumtime_ms': round(cumtime * 1000, 3)}
+        for (filename, line, name), (primitive, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class RequestProfile:
+    """One profiled request; ``full`` adds cProfile to the stack samples and SQL timings."""
+
+    def __init__(self, request, full):
+        self.request = request
+        self.full = full
+        self.id = uuid.uuid4().hex[:16]
+        self.queries = []
+
+    def _record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'ms': round((time.perf_counter() - start) * 1000, 3), 'many': many})
+
+    def run(self, get_response):
+        self.started_at = timezone.now()
+        profiler = cProfile.Profile() if self.full else None
+        start = time.perf_counter()
+        with connection.execute_wrapper(self._record_query), StackSampler(sample_interval()) as sampler:
+            if profiler:
+                profiler.enable()
+            try:
+                response = get_response(self.request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        self.duration = time.perf_counter() - start
+        self.sampler = sampler
+        self.profiler = profiler
+        return response
+
+    def report(self, response):
+        user = getattr(self.request, 'user', None)
+        return {
+            'id': self.id,
+            'mode': 'requested' if self.full else 'sampled',
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'status': response.status_code,
+            'user': user.get_username() if user is not None and user.is_authenticated else None,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 3),
+            'sql_count': len(self.queries),
+            'sql_ms': round(sum(query['ms'] for query in self.queries), 3),
+            'sql': self.queries,
+            'samples': sum(self.sampler.stacks.values()),
+            'top_functions': _cprofile_top(self.profiler) if self.profiler else self.sampler.top_functions(),
+        }
+
+    def save(self, response):
+        """Write the report and collapsed stacks, then trim the ring buffer."""
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'{self.id}.collapsed'), 'w') as f:
+            f.write(self.sampler.collapsed())
+        with open(os.path.join(directory, f'{self.id}.json'), 'w') as f:
+            json.dump(self.report(response), f, indent=1)
+        _trim(directory)
+        return self.id
+
+
+def _trim(directory):
+    reports = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )
+    for entry in reports[keep():]:
+        for path in (entry.path, entry.path[:-len('.json')] + '.collapsed'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _path(profile_id, extension):
+    if not profile_id.isalnum():
+        return None
+    return os.path.join(profile_dir(), f'{profile_id}.{extension}')
+
+
+def recent(limit=50):
+    """Summaries of the newest stored reports."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    entries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )[:limit]
+    summaries = []
+    for entry in entries:
+        try:
+            with open(entry.path) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summaries.append({key: report.get(key) for key in (
+            'id', 'mode', 'method', 'path', 'status', 'user', 'started_at', 'duration_ms', 'sql_count', 'sql_ms',
+        )})
+    return summaries
+
+
+def load(profile_id):
+    path = _path(profile_id, 'json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (TypeError, OSError, ValueError):
+        return None
+
+
+def load_collapsed(profile_id):
+    path = _path(profile_id, 'collapsed')
+    try:
+        with open(path) as f:
+            return f.read()
+    except (TypeError, OSError):
+        return None
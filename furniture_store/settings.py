@@ -53,11 +53,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'furniture_store.middleware.MetricsMiddleware',
+    'furniture_store.middleware.ThresholdGZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'furniture_store.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -139,6 +142,19 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored under content-hash names and served as immutable by
+# store.views.serve_media. Set MEDIA_ACCEL_REDIRECT_PREFIX to an nginx
+# `internal` location aliased to MEDIA_ROOT to let nginx send the bytes.
+STORAGES = {
+    'default': {
+        'BACKEND': 'store.storage.HashedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+MEDIA_ACCEL_REDIRECT_PREFIX = None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -156,8 +172,103 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted when
+    # throttling per client address. With 0 the socket address is used and the
+    # header is ignored; set it to the number of proxies when deployed behind them.
+    'NUM_PROXIES': 0,
+}
+
+# Serve ProductListView from the denormalized store.ProductListing table.
+# Run `python manage.py rebuild_listing` once before enabling it.
+PRODUCT_LISTING_READ_MODEL = False
+
+# Hold cart quantities for a limited time instead of checking stock only on add.
+# Expired holds are released by `python manage.py sweep_reservations`.
+STOCK_RESERVATIONS = False
+STOCK_RESERVATION_TTL = 15 * 60  # seconds
+
+# Number of "frequently bought together" products kept per product.
+# Refreshed from new orders by `python manage.py build_recommendations`.
+RECOMMENDATIONS_TOP_K = 10
+
+# How often (seconds) each worker polls Product.updated_at to refresh its
+# in-memory similar-products index with other workers' changes.
+SIMILAR_PRODUCTS_POLL_INTERVAL = 30
+
+# Typeahead suggestions: extra weight for featured products (on top of units
+# sold) and how often (seconds) each worker polls for catalog changes.
+AUTOCOMPLETE_FEATURED_BOOST = 50
+AUTOCOMPLETE_POLL_INTERVAL = 30
+
+# Per-object serialized representations of products, categories and images,
+# keyed by updated_at (see api/fragments.py). Point API_FRAGMENT_CACHE_ALIAS at
+# a shared cache such as Redis to share fragments between workers.
+API_FRAGMENT_CACHE = True
+API_FRAGMENT_CACHE_ALIAS = 'default'
+API_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60  # seconds
+
+# Build routes, serializers and filtersets (and, with WARMUP_CATALOG, the
+# similar-products and autocomplete indexes) when wsgi.py/asgi.py is loaded.
+WARMUP_ON_STARTUP = True
+WARMUP_CATALOG = True
+
+# Responses smaller than this many bytes are not gzipped.
+GZIP_MIN_LENGTH = 1024
+
+# Limits of one bulk image upload (api/products/images/bulk/, upload_images).
+BULK_IMAGE_MAX_FILES = 200
+BULK_IMAGE_MAX_FILE_SIZE = 10 * 1024 * 1024  # bytes
+
+# `python manage.py archive_orders` moves orders in these statuses that haven't
+# changed for ORDER_ARCHIVE_AFTER_DAYS into the archive tables.
+ORDER_ARCHIVE_AFTER_DAYS = 365
+ORDER_ARCHIVE_STATUSES = ('delivered', 'canceled')
+
+# `python manage.py purge_carts` deletes carts untouched for this many days.
+STALE_CART_DAYS = 30
+
+# Anonymous visitors keep their cart in a signed cookie (api/guest_cart.py),
+# merged into their account cart on login or registration.
+GUEST_CARTS = True
+GUEST_CART_COOKIE_NAME = 'guest_cart'
+GUEST_CART_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+GUEST_CART_MAX_ITEMS = 50
+
+# Prometheus-format metrics at /metrics (furniture_store/metrics.py). With
+# several worker processes, point METRICS_DIR at a directory they share (and
+# clear it on deploy) so any worker reports the totals of all of them.
+# Set METRICS_TOKEN to require "Authorization: Bearer <token>".
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5  # seconds
+METRICS_TOKEN = None
+
+# Staff can profile a request with ?profile=1 or an "X-Profile: 1" header;
+# PROFILE_SAMPLE_RATE (0-1) also samples that share of all requests with the
+# low-overhead stack sampler. The newest PROFILE_KEEP reports are kept in
+# PROFILE_DIR and listed at /api/profiles/.
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_KEEP = 200
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+
+# Token-bucket rate limits (see api/throttling.py): scope -> (tokens refilled per
+# second, bucket size). 'catalog' covers anonymous catalog reads per client address,
+# 'cart' cart changes and checkout per user, 'auth' login and registration per
+# address. Buckets live in THROTTLE_CACHE_ALIAS, which must be a cache shared by
+# all workers (memcached or Redis) for the limits to be global; the check framework
+# warns (api.W001) while it is a per-process, dummy, file or database cache.
+THROTTLING = True
+THROTTLE_CACHE_ALIAS = 'default'
+THROTTLE_RATES = {
+    'catalog': (10, 60),
+    'cart': (2, 20),
+    'auth': (0.1, 10),
 }
 
 # CORS settings
@@ -175,3 +286,10 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Run with `celery -A furniture_store beat` next to a worker, instead of the cron
+# lines in the README. Schedules are in seconds.
+CELERY_BEAT_SCHEDULE = {
+    'sweep-reservations': {'task': 'store.tasks.sweep_reservations', 'schedule': 60},
+    'apply-price-lists': {'task': 'store.tasks.apply_price_lists', 'schedule': 60},
+    'purge-carts': {'task': 'store.tasks.purge_carts', 'schedule': 24 * 60 * 60},
+}
@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Category, Product, ProductImage, Cart, CartItem, Order, OrderItem,
+    InventoryMovement, PriceList, PriceListEntry, Warehouse, WarehouseStock,
+)
+from . import archive, inventory, pricing
 
 
 class ProductImageInline(admin.TabularInline):
@@ -9,6 +13,13 @@ class ProductImageInline(admin.TabularInline):
     fields = ['image', 'is_primary']
 
 
+class WarehouseStockInline(admin.TabularInline):
+    model = WarehouseStock
+    extra = 0
+    fields = ['warehouse', 'quantity']
+    can_delete = False
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'slug', 'is_active', 'created_at']
@@ -24,9 +35,9 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['category', 'is_available', 'featured', 'color', 'material', 'created_at']
     search_fields = ['name', 'slug', 'description']
     prepopulated_fields = {'slug': ('name',)}
-    list_editable = ['price', 'stock', 'is_available', 'featured']
-    readonly_fields = ['created_at', 'updated_at']
-    inlines = [ProductImageInline]
+    list_editable = ['price', 'is_available', 'featured']
+    readonly_fields = ['stock', 'reserved', 'created_at', 'updated_at']
+    inlines = [WarehouseStockInline, ProductImageInline]
     ordering = ['-created_at']
     
     fieldsets = (
@@ -34,7 +45,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('name', 'slug', 'category', 'description')
         }),
         ('Pricing and Stock', {
-            'fields': ('price', 'stock', 'is_available', 'featured')
+            'fields': ('price', 'stock', 'reserved', 'is_available', 'featured')
         }),
         ('Additional Details', {
             'fields': ('color', 'material')
@@ -45,6 +56,93 @@ class ProductAdmin(admin.ModelAdmin):
         })
     )
 
+    def save_model(self, request, obj, form, change):
+        # Stock is the sum of the warehouse rows, changed only through the ledger.
+        if change:
+            obj.save(update_fields=[field.name for field in obj._meta.concrete_fields
+                                    if not field.primary_key and field.name not in ('stock', 'reserved')])
+        else:
+            obj.save()
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is not WarehouseStock:
+            return super().save_formset(request, form, formset, change)
+        # Warehouse quantities change through ledger movements; a row moved to
+        # another warehouse takes its old quantity out of the old one.
+        formset.save(commit=False)
+        note = f'Admin edit by {request.user}'
+        movements = []
+        for row in formset.forms:
+            if not row.has_changed() or not row.cleaned_data:
+                continue
+            warehouse, quantity = row.cleaned_data['warehouse'], row.cleaned_data['quantity']
+            if row.instance.pk is None:
+                movements.append(InventoryMovement(product=form.instance, warehouse=warehouse,
+                                                   kind=InventoryMovement.RESTOCK, quantity=quantity, note=note))
+                continue
+            old_warehouse_id, old_quantity = row.initial['warehouse'], row.initial['quantity']
+            if warehouse.pk != old_warehouse_id:
+                movements.append(InventoryMovement(product=form.instance, warehouse_id=old_warehouse_id,
+                                                   kind=InventoryMovement.ADJUSTMENT, quantity=-old_quantity, note=note))
+                old_quantity = 0
+            movements.append(InventoryMovement(product=form.instance, warehouse=warehouse,
+                                               kind=InventoryMovement.ADJUSTMENT, quantity=quantity - old_quantity,
+                                               note=note))
+        movements = [movement for movement in movements if movement.quantity]
+        if movements:
+            inventory.apply_movements(movements)
+            form.instance.refresh_from_db(fields=['stock'])
+
+
+class PriceListEntryInline(admin.TabularInline):
+    model = PriceListEntry
+    extra = 0
+    fields = ['product', 'price', 'previous_price']
+    readonly_fields = ['previous_price']
+    raw_id_fields = ['product']
+
+    # Entries are fixed once applied; deactivation restores what activation wrote.
+    def has_add_permission(self, request, obj=None):
+        return (obj is None or obj.status == PriceList.SCHEDULED) and super().has_add_permission(request, obj)
+
+    def has_change_permission(self, request, obj=None):
+        return (obj is None or obj.status == PriceList.SCHEDULED) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return (obj is None or obj.status == PriceList.SCHEDULED) and super().has_delete_permission(request, obj)
+
+
+@admin.register(PriceList)
+class PriceListAdmin(admin.ModelAdmin):
+    list_display = ['name', 'starts_at', 'ends_at', 'status', 'activated_at', 'ended_at']
+    list_filter = ['status', 'starts_at']
+    search_fields = ['name']
+    readonly_fields = ['status', 'activated_at', 'ended_at', 'created_at']
+    inlines = [PriceListEntryInline]
+    ordering = ['-starts_at']
+    actions = ['end_now']
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None and obj.status != PriceList.SCHEDULED:
+            return [*self.readonly_fields, 'starts_at']
+        return self.readonly_fields
+
+    # Deleting an applied list would drop the previous prices its entries hold,
+    # so only scheduled lists can be deleted one by one.
+    def has_delete_permission(self, request, obj=None):
+        return (obj is None or obj.status == PriceList.SCHEDULED) and super().has_delete_permission(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletion isn't checked per list: restore prices before the entries go.
+        for price_list in queryset.filter(status=PriceList.ACTIVE):
+            pricing.deactivate(price_list)
+        super().delete_queryset(request, queryset)
+
+    @admin.action(description='End selected active price lists now')
+    def end_now(self, request, queryset):
+        restored = sum(pricing.deactivate(price_list) for price_list in queryset.filter(status=PriceList.ACTIVE))
+        self.message_user(request, f'Restored the prices of {restored} products')
+
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
@@ -95,7 +193,72 @@ class OrderAdmin(admin.ModelAdmin):
         })
     )
     
+    def get_readonly_fields(self, request, obj=None):
+        # A canceled order's stock is back on the shelves; reopening it would sell it twice.
+        if obj is not None and obj.status == 'canceled':
+            return [*self.readonly_fields, 'status']
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data and obj.status == 'canceled':
+            inventory.return_order(obj)
+
     def has_delete_permission(self, request, obj=None):
         if obj and obj.status in ['processing', 'shipped', 'delivered']:
             return False
         return super().has_delete_permission(request, obj)
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    fields = ['product', 'quantity', 'price', 'get_total_price']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'user', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['order_number', 'user__username', 'user__email', 'phone']
+    inlines = [ArchivedOrderItemInline]
+    ordering = ['-created_at']
+    actions = ['restore']
+
+    @admin.action(description='Restore selected orders')
+    def restore(self, request, queryset):
+        restored = archive.restore_orders(queryset)
+        self.message_user(request, f'Restored {restored} orders')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Warehouse)
+class WarehouseAdmin(admin.ModelAdmin):
+    list_display = ['name', 'code', 'priority', 'created_at']
+    search_fields = ['name', 'code']
+    prepopulated_fields = {'code': ('name',)}
+    ordering = ['priority', 'id']
+
+
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'kind', 'quantity', 'warehouse', 'order', 'note', 'created_at']
+    list_filter = ['kind', 'warehouse', 'created_at']
+    search_fields = ['product__name', 'order__order_number', 'note']
+    raw_id_fields = ['product', 'order', 'archived_order', 'warehouse']
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
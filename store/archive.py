@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, InventoryMovement, Order, OrderItem
+
+ORDER_FIELDS = [
+    'id', 'user_id', 'order_number', 'status', 'total_amount', 'shipping_address',
+    'phone', 'notes', 'created_at', 'updated_at',
+]
+ITEM_FIELDS = ['id', 'order_id', 'product_id', 'quantity', 'price']
+
+
+def archive_after_days():
+    return getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365)
+
+
+def archive_statuses():
+    return getattr(settings, 'ORDER_ARCHIVE_STATUSES', ('delivered', 'canceled'))
+
+
+def archivable_orders(older_than=None):
+    """Orders in a terminal status that haven't changed for ``older_than`` (a timedelta).
+
+    Ordered along the ``(status, updated_at)`` index, so a batch is read
+    from the index without sorting every match.
+    """
+    if older_than is None:
+        older_than = timedelta(days=archive_after_days())
+    return Order.objects.filter(
+        status__in=archive_statuses(), updated_at__lt=timezone.now() - older_than
+    ).order_by('status', 'updated_at', 'pk')
+
+
+def _copy(rows, model, fields):
+    created = model.objects.bulk_create([model(**{field: row[field] for field in fields}) for row in rows])
+    # bulk_create stamps auto_now/auto_now_add fields with the current time;
+    # put the original timestamps back.
+    stamped = [
+        field.name for field in model._meta.concrete_fields
+        if field.name in fields and (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False))
+    ]
+    if rows and stamped:
+        model.objects.filter(pk__in=[row['id'] for row in rows]).update(**{
+            name: Case(*[When(pk=row['id'], then=Value(row[name])) for row in rows], output_field=DateTimeField())
+            for name in stamped
+        })
+    return created
+
+
+def _move(order_ids, source, source_item, target, target_item, movement_keys):
+    """Move orders ``order_ids`` and their items from one pair of tables to the other.
+
+    ``movement_keys`` names the InventoryMovement foreign keys to the source
+    and target tables; the orders' movements are repointed before the
+    source rows are deleted.
+    """
+    source_key, target_key = movement_keys
+    orders = list(source.objects.filter(pk__in=order_ids).values(*ORDER_FIELDS))
+    items = list(source_item.objects.filter(order_id__in=order_ids).values(*ITEM_FIELDS))
+    _copy(orders, target, ORDER_FIELDS)
+    _copy(items, target_item, ITEM_FIELDS)
+    InventoryMovement.objects.filter(**{f'{source_key}__in': order_ids}).update(
+        **{target_key: F(source_key), source_key: None}
+    )
+    source_item.objects.filter(order_id__in=order_ids).delete()
+    source.objects.filter(pk__in=order_ids).delete()
+    return len(orders)
+
+
+def archive_orders(older_than=None, batch_size=500):
+    """Move archivable orders and their items into the archive tables.
+
+    Each batch of ``batch_size`` orders is copied and deleted in its own
+    transaction, so the hot tables are never locked for long and an
+    interrupted run can simply be repeated. Inventory movements follow
+    their order. Returns the number of orders archived.
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                archivable_orders(older_than).select_for_update()
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not order_ids:
+                break
+            archived += _move(order_ids, Order, OrderItem, ArchivedOrder, ArchivedOrderItem,
+                              ('order_id', 'archived_order_id'))
+    return archived
+
+
+def restore_orders(queryset, batch_size=500):
+    """Move the archived orders in ``queryset`` back into the hot tables.
+
+    Restored orders keep their id, number and timestamps. Returns the number
+    of orders restored.
+    """
+    order_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    restored = 0
+    for start in range(0, len(order_ids), batch_size):
+        batch = order_ids[start:start + batch_size]
+        with transaction.atomic():
+            restored += _move(batch, ArchivedOrder, ArchivedOrderItem, Order, OrderItem,
+                              ('archived_order_id', 'order_id'))
+    return restored
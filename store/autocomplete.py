@@ -0,0 +1,220 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .feeds import ChangeFeed
+from .models import ArchivedOrderItem, Category, Product
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    return ' '.join(_NON_WORD.sub(' ', text.casefold()).split())
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over suggestion labels.
+
+    Every word suffix of a label is a key, so "Modern Office Chair" is found
+    by "mod", "off" and "cha". Keys are ``(text, kind, id)`` tuples kept
+    sorted for ``bisect``; the best ``cache_size`` entries of every prefix up
+    to ``cached_prefix_len`` characters are precomputed because those ranges
+    are the widest.
+    """
+
+    def __init__(self, cached_prefix_len=2, cache_size=20):
+        self.cached_prefix_len = cached_prefix_len
+        self.cache_size = cache_size
+        self.keys = []
+        self.entries = {}
+        self.top = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key_texts(self, label):
+        words = normalize(label).split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _range(self, prefix):
+        lo = bisect_left(self.keys, (prefix,))
+        hi = bisect_left(self.keys, (prefix + '\U0010ffff',))
+        return self.keys[lo:hi]
+
+    def _rank(self, ref):
+        return (self.entries[ref]['weight'], -ref[1])
+
+    def _best(self, keys, limit):
+        refs = {(kind, pk) for _, kind, pk in keys}
+        return heapq.nlargest(limit, refs, key=self._rank)
+
+    def _cached_prefixes(self, texts):
+        return {text[:n] for text in texts for n in range(1, self.cached_prefix_len + 1) if len(text) >= n}
+
+    def _rebuild_cache(self, prefixes):
+        for prefix in prefixes:
+            best = self._best(self._range(prefix), self.cache_size)
+            if best:
+                self.top[prefix] = best
+            else:
+                self.top.pop(prefix, None)
+
+    def _uncache(self, ref, texts):
+        """Drop ``ref`` from cached prefix lists; return the lists that need a rescan.
+
+        A list shorter than ``cache_size`` holds every entry of its prefix, so
+        removing from it keeps it exact. A full list may now be missing a
+        runner-up and has to be rebuilt from the key range.
+        """
+        stale = set()
+        for prefix in self._cached_prefixes(texts):
+            top = self.top.get(prefix)
+            if top and ref in top:
+                if len(top) == self.cache_size:
+                    stale.add(prefix)
+                top.remove(ref)
+                if not top:
+                    del self.top[prefix]
+        return stale
+
+    def _cache(self, ref, texts, stale):
+        for prefix in self._cached_prefixes(texts) - stale:
+            top = self.top.setdefault(prefix, [])
+            top.append(ref)
+            top.sort(key=self._rank, reverse=True)
+            del top[self.cache_size:]
+
+    def _remove_keys(self, ref):
+        entry = self.entries.pop(ref, None)
+        for text in entry['keys'] if entry else ():
+            key = (text, *ref)
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                del self.keys[i]
+
+    def put(self, kind, pk, label, weight, **payload):
+        ref = (kind, pk)
+        stale = self._uncache(ref, self.entries[ref]['keys']) if ref in self.entries else set()
+        self._remove_keys(ref)
+        texts = self._key_texts(label)
+        self.entries[ref] = {'weight': weight, 'keys': texts, 'payload': dict(payload, type=kind, id=pk, name=label)}
+        for text in texts:
+            insort(self.keys, (text, kind, pk))
+        self._cache(ref, texts, stale)
+        self._rebuild_cache(stale)
+
+    def load(self, items):
+        """Bulk-load ``(kind, pk, label, weight, payload)`` items, replacing the contents."""
+        self.entries, self.keys, self.top = {}, [], {}
+        for kind, pk, label, weight, payload in items:
+            texts = self._key_texts(label)
+            self.entries[(kind, pk)] = {'weight': weight, 'keys': texts, 'payload': dict(payload, type=kind, id=pk, name=label)}
+            self.keys.extend((text, kind, pk) for text in texts)
+        self.keys.sort()
+        self._rebuild_cache(self._cached_prefixes({text for text, _, _ in self.keys}))
+
+    def remove(self, kind, pk):
+        ref = (kind, pk)
+        if ref in self.entries:
+            stale = self._uncache(ref, self.entries[ref]['keys'])
+            self._remove_keys(ref)
+            self._rebuild_cache(stale)
+
+    def search(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.cached_prefix_len and limit <= self.cache_size:
+            refs = self.top.get(prefix, [])[:limit]
+        else:
+            refs = self._best(self._range(prefix), limit)
+        return [self.entries[ref]['payload'] for ref in refs]
+
+
+def featured_boost():
+    return getattr(settings, 'AUTOCOMPLETE_FEATURED_BOOST', 50)
+
+
+def _product_items(queryset):
+    archived_sales = (ArchivedOrderItem.objects.filter(product=OuterRef('pk'))
+                      .order_by().values('product').annotate(total=Sum('quantity')).values('total'))
+    rows = (
+        queryset.filter(is_available=True)
+        .annotate(sales=Coalesce(Sum('orderitem__quantity'), 0) + Coalesce(Subquery(archived_sales), 0))
+        .values_list('pk', 'name', 'slug', 'featured', 'sales')
+    )
+    return [
+        (PRODUCT, pk, name, sales + (featured_boost() if featured else 0), {'slug': slug})
+        for pk, name, slug, featured, sales in rows
+    ]
+
+
+def _category_items(queryset):
+    rows = (
+        queryset.filter(is_active=True)
+        .annotate(product_total=Count('products', filter=Q(products__is_available=True)))
+        .values_list('pk', 'name', 'slug', 'product_total')
+    )
+    return [(CATEGORY, pk, name, total, {'slug': slug}) for pk, name, slug, total in rows]
+
+
+_index = None
+_feeds = None
+_changed = set()
+_lock = threading.Lock()
+
+
+def _apply(index, kind, pks, items):
+    for item in items:
+        index.put(item[0], item[1], item[2], item[3], **item[4])
+    for pk in set(pks) - {item[1] for item in items}:
+        index.remove(kind, pk)
+
+
+def mark_changed(kind, pk):
+    """Queue a product or category for re-indexing on this process's next query."""
+    with _lock:
+        _changed.add((kind, pk))
+
+
+def get_index():
+    """Return this process's index, applying local and polled catalog changes.
+
+    Other workers' writes are picked up by polling ``updated_at`` on products
+    and categories at most every ``AUTOCOMPLETE_POLL_INTERVAL`` seconds.
+    """
+    global _index, _feeds
+    with _lock:
+        if _index is None:
+            interval = getattr(settings, 'AUTOCOMPLETE_POLL_INTERVAL', 30)
+            _feeds = {PRODUCT: ChangeFeed(interval), CATEGORY: ChangeFeed(interval)}
+            for feed in _feeds.values():
+                feed.start()
+            _index = PrefixIndex()
+            _index.load(_product_items(Product.objects.all()) + _category_items(Category.objects.all()))
+            _changed.clear()
+            return _index
+        changed = {PRODUCT: set(), CATEGORY: set()}
+        for kind, pk in _changed:
+            changed[kind].add(pk)
+        if _feeds[PRODUCT].due():
+            changed[PRODUCT].update(_feeds[PRODUCT].changed(Product.objects.values_list('pk', flat=True)))
+            changed[CATEGORY].update(_feeds[CATEGORY].changed(Category.objects.values_list('pk', flat=True)))
+        if changed[PRODUCT]:
+            _apply(_index, PRODUCT, changed[PRODUCT], _product_items(Product.objects.filter(pk__in=changed[PRODUCT])))
+        if changed[CATEGORY]:
+            _apply(_index, CATEGORY, changed[CATEGORY], _category_items(Category.objects.filter(pk__in=changed[CATEGORY])))
+        _changed.clear()
+        return _index
+
+
+def suggest(prefix, limit=10):
+    return get_index().search(prefix, limit)
@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Cart, CartItem, Product
+from .reservations import release_carts, reservations_enabled, reserve
+
+
+def stale_cart_days():
+    return getattr(settings, 'STALE_CART_DAYS', 30)
+
+
+def stale_carts(older_than=None, now=None):
+    """Carts untouched for ``older_than`` (a timedelta), with no item added since."""
+    if older_than is None:
+        older_than = timedelta(days=stale_cart_days())
+    cutoff = (now or timezone.now()) - older_than
+    recent_items = CartItem.objects.filter(cart=OuterRef('pk'), added_at__gte=cutoff)
+    return Cart.objects.filter(updated_at__lt=cutoff).exclude(Exists(recent_items))
+
+
+def purge_stale_carts(older_than=None, batch_size=200, pause=0.0, progress=None):
+    """Delete stale carts with their items and stock holds, ``batch_size`` carts at a time.
+
+    Every batch is its own short transaction, re-checking staleness as it
+    deletes so a cart touched meanwhile survives, and ``pause`` seconds
+    pass between batches to let request writers through. ``progress`` is
+    called with the running ``(carts, items)`` totals after each batch.
+    Users get a new cart on their next cart request. Returns the totals.
+    """
+    now = timezone.now()
+    carts = items = 0
+    while True:
+        with transaction.atomic():
+            batch = stale_carts(older_than, now).order_by('updated_at')
+            cart_ids = list(batch.select_for_update().values_list('pk', flat=True)[:batch_size])
+            if not cart_ids:
+                break
+            release_carts(cart_ids)
+            deleted = batch.filter(pk__in=cart_ids).delete()[1]
+            carts += deleted.get(Cart._meta.label, 0)
+            items += deleted.get(CartItem._meta.label, 0)
+        if progress:
+            progress(carts, items)
+        if len(cart_ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return carts, items
+
+
+def merge_items(user, quantities):
+    """Add ``{product_id: quantity}`` lines (a guest cart) to ``user``'s cart.
+
+    Quantities add up with what the cart already holds, capped at the
+    product's stock; unavailable products are skipped. All lines are
+    written with one upsert. With stock reservations on, each added
+    quantity is reserved first and lines that can't be are skipped.
+    Returns the number of lines merged.
+    """
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        products = {
+            product.pk: product
+            for product in Product.objects.filter(pk__in=quantities, is_available=True).only('pk', 'stock')
+        }
+        existing = dict(cart.items.filter(product_id__in=products).values_list('product_id', 'quantity'))
+        rows = []
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                continue
+            current = existing.get(product_id, 0)
+            added = min(current + quantity, product.stock) - current
+            if added <= 0 or (reservations_enabled() and not reserve(cart, product, added)):
+                continue
+            rows.append(CartItem(cart=cart, product_id=product_id, quantity=current + added))
+        if rows:
+            CartItem.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity']
+            )
+            cart.save(update_fields=['updated_at'])
+    return len(rows)
@@ -0,0 +1,31 @@
+import time
+
+from django.utils import timezone
+
+
+class ChangeFeed:
+    """Tracks an ``updated_at`` watermark for polling rows changed by other processes.
+
+    Deletes are not visible through the feed; consumers learn about them from
+    local signals or by filtering at read time.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.watermark = None
+        self.last_poll = 0.0
+
+    def start(self):
+        self.watermark = timezone.now()
+        self.last_poll = time.monotonic()
+
+    def due(self):
+        return time.monotonic() - self.last_poll >= self.interval
+
+    def changed(self, queryset):
+        """Rows of ``queryset`` touched since the previous call; advances the watermark."""
+        polled_at = timezone.now()
+        rows = list(queryset.filter(updated_at__gte=self.watermark))
+        self.watermark = polled_at
+        self.last_poll = time.monotonic()
+        return rows
@@ -0,0 +1,159 @@
+import io
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import BooleanField, Case, Value, When
+from django.utils import timezone
+from PIL import Image
+
+from .listing import refresh_products
+from .models import Product, ProductImage
+from .utils import resolve_products
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+
+
+class ImageRejected(Exception):
+    pass
+
+
+@dataclass
+class ImageUpload:
+    """One file of a bulk upload; ``product`` is a product id or slug."""
+    product: str
+    name: str
+    data: bytes
+    primary: bool = False
+
+
+def max_files():
+    return getattr(settings, 'BULK_IMAGE_MAX_FILES', 200)
+
+
+def max_file_size():
+    return getattr(settings, 'BULK_IMAGE_MAX_FILE_SIZE', 10 * 1024 * 1024)
+
+
+def read_zip(fileobj, product=None, primary=()):
+    """Yield the images of a zip archive.
+
+    Entries are ``<product id or slug>/<file>``, or bare files when
+    ``product`` is given. Entries whose path or file name is in ``primary``
+    are marked primary. Oversized entries are rejected from their headers,
+    before anything is decompressed.
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as exc:
+        raise ImageRejected(f'Not a zip archive: {exc}')
+    with archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not posixpath.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+            and posixpath.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        if len(entries) > max_files():
+            raise ImageRejected(f'At most {max_files()} images per upload')
+        for info in entries:
+            if info.file_size > max_file_size():
+                raise ImageRejected(f'{info.filename} is larger than {max_file_size()} bytes')
+            directory, name = posixpath.split(info.filename)
+            key = product if product is not None else posixpath.basename(directory)
+            if not key:
+                raise ImageRejected(f'{info.filename}: put images in a folder named after the product id or slug')
+            yield ImageUpload(key, info.filename, archive.read(info),
+                              primary=info.filename in primary or name in primary)
+
+
+def check_image(data):
+    """Fully decode ``data`` with Pillow; return its format or raise ImageRejected."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            image_format = image.format
+    except Exception as exc:
+        raise ImageRejected(f'Not a valid image: {exc}')
+    if image_format not in ALLOWED_FORMATS:
+        raise ImageRejected(f'Unsupported image format {image_format}')
+    return image_format
+
+
+def _check(upload):
+    try:
+        check_image(upload.data)
+    except ImageRejected as exc:
+        return str(exc)
+    return None
+
+
+def import_images(uploads, workers=4):
+    """Validate and attach ``uploads`` to their products.
+
+    Images are decoded in a pool of ``workers`` threads (Pillow releases
+    the GIL while decoding), stored through the default storage and
+    inserted with one ``bulk_create``. Each affected product then gets its
+    primary image set by a single UPDATE: the last upload marked primary,
+    or the first new image if the product had none. Returns ``(created,
+    errors)`` where ``errors`` is a list of ``(name, message)``.
+    """
+    uploads = list(uploads)
+    if len(uploads) > max_files():
+        raise ImageRejected(f'At most {max_files()} images per upload')
+    products = resolve_products((upload.product for upload in uploads), strict=False)
+    errors, valid = [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for upload, error in zip(uploads, pool.map(_check, uploads)):
+            if upload.product not in products:
+                errors.append((upload.name, f'Unknown product {upload.product}'))
+            elif len(upload.data) > max_file_size():
+                errors.append((upload.name, f'Larger than {max_file_size()} bytes'))
+            elif error:
+                errors.append((upload.name, error))
+            else:
+                valid.append(upload)
+    if not valid:
+        return [], errors
+
+    with transaction.atomic():
+        rows = []
+        for upload in valid:
+            name = default_storage.save(
+                posixpath.join('products', posixpath.basename(upload.name)), ContentFile(upload.data)
+            )
+            rows.append(ProductImage(product_id=products[upload.product], image=name, is_primary=False))
+        created = ProductImage.objects.bulk_create(rows)
+
+        chosen = {}
+        for upload, image in zip(valid, created):
+            if upload.primary or image.product_id not in chosen:
+                chosen[image.product_id] = (upload.primary, image.pk)
+        has_primary = set(
+            ProductImage.objects.filter(product_id__in=chosen, is_primary=True).values_list('product_id', flat=True)
+        )
+        primaries = {product_id: pk for product_id, (explicit, pk) in chosen.items()
+                     if explicit or product_id not in has_primary}
+        now = timezone.now()
+        if primaries:
+            ProductImage.objects.filter(product_id__in=primaries).update(is_primary=Case(
+                When(pk__in=primaries.values(), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ), updated_at=now)
+        Product.objects.filter(pk__in=chosen).update(updated_at=now)
+        refresh_products(chosen)
+
+    primary_ids = set(primaries.values())
+    for image in created:
+        image.is_primary = image.pk in primary_ids
+    return created, errors
@@ -0,0 +1,331 @@
+import csv
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .listing import refresh_products
+from .models import InventoryMovement, InventorySnapshot, Product, Warehouse, WarehouseStock
+from .utils import resolve_products
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f"Insufficient stock for {product}")
+
+
+def _delta_case(totals, field='stock', key='pk'):
+    return Case(
+        *[When(**{key: product_id}, then=F(field) + Value(quantity)) for product_id, quantity in totals.items()],
+        output_field=IntegerField(),
+    )
+
+
+def default_warehouse():
+    """Where stock added without a location goes: the first warehouse by priority."""
+    warehouse = Warehouse.objects.order_by('priority', 'pk').first()
+    if warehouse is None:
+        warehouse = Warehouse.objects.create(name='Main warehouse', code='main')
+    return warehouse
+
+
+def _locked_stock(product_ids):
+    """``{product_id: {warehouse_id: quantity}}`` for ``product_ids``, rows locked until commit."""
+    available = defaultdict(dict)
+    rows = (
+        WarehouseStock.objects.select_for_update(of=('self',))
+        .filter(product_id__in=product_ids, quantity__gt=0)
+        .order_by('product_id', 'warehouse_id')
+        .values_list('product_id', 'warehouse_id', 'quantity')
+    )
+    for product_id, warehouse_id, quantity in rows:
+        available[product_id][warehouse_id] = quantity
+    return available
+
+
+def _place(movements):
+    """Give every movement a warehouse, splitting removals across warehouses.
+
+    Additions without a warehouse go to the default one. Removals without
+    one are allocated deterministically, in warehouse priority order: from
+    a single warehouse that can cover all of them (one shipment per order)
+    if there is one; otherwise each line from the first warehouse holding
+    all of it, or split across warehouses. Raises InsufficientStock when
+    the stock, net of removals with an explicit warehouse, falls short.
+    """
+    removals = [movement for movement in movements if movement.quantity < 0]
+    available = _locked_stock({movement.product_id for movement in removals}) if removals else {}
+    needed = defaultdict(int)
+    for movement in removals:
+        if movement.warehouse_id is None:
+            needed[movement.product_id] -= movement.quantity
+            continue
+        left = available[movement.product_id].get(movement.warehouse_id, 0) + movement.quantity
+        if left < 0:
+            raise InsufficientStock(movement.product)
+        available[movement.product_id][movement.warehouse_id] = left
+    order = list(Warehouse.objects.values_list('pk', flat=True)) if needed else []
+    single = next((
+        warehouse_id for warehouse_id in order
+        if all(available[product_id].get(warehouse_id, 0) >= quantity for product_id, quantity in needed.items())
+    ), None)
+
+    placed, default = [], None
+    for movement in movements:
+        if movement.warehouse_id is not None:
+            placed.append(movement)
+        elif movement.quantity >= 0:
+            default = default or default_warehouse()
+            movement.warehouse = default
+            placed.append(movement)
+        else:
+            stock, need = available[movement.product_id], -movement.quantity
+            whole = single or next((warehouse_id for warehouse_id in order if stock.get(warehouse_id, 0) >= need), None)
+            for warehouse_id in [whole] if whole else order:
+                taken = min(need, stock.get(warehouse_id, 0))
+                if taken:
+                    stock[warehouse_id] -= taken
+                    need -= taken
+                    placed.append(InventoryMovement(
+                        product_id=movement.product_id, warehouse_id=warehouse_id, kind=movement.kind,
+                        quantity=-taken, order_id=movement.order_id, archived_order_id=movement.archived_order_id,
+                        note=movement.note,
+                    ))
+                if not need:
+                    break
+            if need:
+                raise InsufficientStock(movement.product)
+    return placed
+
+
+def _apply_warehouse_totals(movements):
+    by_warehouse = defaultdict(lambda: defaultdict(int))
+    for movement in movements:
+        by_warehouse[movement.warehouse_id][movement.product_id] += movement.quantity
+    for warehouse_id, totals in by_warehouse.items():
+        totals = {product_id: quantity for product_id, quantity in totals.items() if quantity}
+        if not totals:
+            continue
+        WarehouseStock.objects.bulk_create([
+            WarehouseStock(warehouse_id=warehouse_id, product_id=product_id)
+            for product_id, quantity in totals.items() if quantity > 0
+        ], ignore_conflicts=True)
+        WarehouseStock.objects.filter(warehouse_id=warehouse_id, product_id__in=totals).update(
+            quantity=_delta_case(totals, field='quantity', key='product_id')
+        )
+
+
+def log_movements(movements):
+    """Append movements whose effect on stock is applied elsewhere."""
+    return InventoryMovement.objects.bulk_create(movements)
+
+
+def apply_movements(movements, product_stock=True):
+    """Append movements and project them onto warehouse stock and ``Product.stock``.
+
+    Movements without a warehouse are placed by ``_place`` first, which
+    may split a removal into several movements. Then each warehouse's
+    totals are written with one UPDATE, and ``Product.stock`` -- their sum
+    -- with another, unless the caller has already changed it
+    (``product_stock=False``). Raises InsufficientStock when a removal
+    can't be covered. Returns the movements written.
+    """
+    with transaction.atomic():
+        movements = _place(movements)
+        log_movements(movements)
+        _apply_warehouse_totals(movements)
+        totals = defaultdict(int)
+        for movement in movements:
+            totals[movement.product_id] += movement.quantity
+        if totals:
+            if product_stock:
+                Product.objects.filter(pk__in=totals).update(stock=_delta_case(totals), updated_at=timezone.now())
+            refresh_products(totals)
+    return movements
+
+
+def record(product, kind, quantity, order=None, note=''):
+    return apply_movements([
+        InventoryMovement(product_id=product.pk, kind=kind, quantity=quantity, order=order, note=note)
+    ])[0]
+
+
+def return_order(order):
+    """Put the stock of a canceled order back into the warehouses it was taken from.
+
+    Only what was sold and not yet returned goes back, so canceling the same
+    order again returns nothing. Orders without sale movements return their
+    items to the default warehouse, once.
+    """
+    with transaction.atomic():
+        type(order).objects.select_for_update().filter(pk=order.pk).first()
+        booked = (
+            order.movements.filter(kind__in=[InventoryMovement.SALE, InventoryMovement.CANCEL_RETURN])
+            .values('product_id', 'warehouse_id').annotate(quantity=Sum('quantity'))
+            .order_by()
+            .values_list('product_id', 'warehouse_id', 'quantity')
+        )
+        if booked:
+            lines = [(product_id, warehouse_id, -quantity) for product_id, warehouse_id, quantity in booked if quantity < 0]
+        else:
+            lines = [(item.product_id, None, item.quantity) for item in order.items.all()]
+        return apply_movements([
+            InventoryMovement(
+                product_id=product_id, warehouse_id=warehouse_id, kind=InventoryMovement.CANCEL_RETURN,
+                quantity=quantity, order=order,
+            )
+            for product_id, warehouse_id, quantity in lines
+        ])
+
+
+def restock(warehouse, quantities, note='', batch_size=500):
+    """Add ``{product_id: quantity}`` to ``warehouse``, in one transaction.
+
+    Each batch of ``batch_size`` products is one INSERT into the ledger and
+    one UPDATE each of the warehouse stock and product stock. Returns the
+    number of units added.
+    """
+    lines = [(product_id, quantity) for product_id, quantity in quantities.items() if quantity]
+    with transaction.atomic():
+        for start in range(0, len(lines), batch_size):
+            apply_movements([
+                InventoryMovement(product_id=product_id, warehouse=warehouse, kind=InventoryMovement.RESTOCK,
+                                  quantity=quantity, note=note)
+                for product_id, quantity in lines[start:start + batch_size]
+            ])
+    return sum(quantity for _, quantity in lines)
+
+
+def read_quantities(fileobj):
+    """``{product id: quantity}`` from a CSV with ``product`` (id or slug) and ``quantity`` columns.
+
+    Repeated products add up. Raises ValueError naming the first bad line.
+    """
+    rows = []
+    reader = csv.DictReader(fileobj)
+    for row in reader:
+        try:
+            rows.append(((row.get('product') or '').strip(), int(row['quantity'])))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'line {reader.line_num}: expected product and quantity columns')
+        if rows[-1][1] <= 0:
+            raise ValueError(f'line {reader.line_num}: quantity must be positive')
+    ids = resolve_products(key for key, _ in rows)
+    quantities = defaultdict(int)
+    for key, quantity in rows:
+        quantities[ids[key]] += quantity
+    return dict(quantities)
+
+
+def _unfolded_movements():
+    last_folded = InventorySnapshot.objects.filter(product=OuterRef('product')).values('last_movement_id')
+    return InventoryMovement.objects.filter(id__gt=Coalesce(Subquery(last_folded), Value(0)))
+
+
+def _pending_deltas():
+    """Net quantity and newest id of the movements not yet folded, per product."""
+    rows = (
+        _unfolded_movements()
+        .values('product_id')
+        .annotate(delta=Sum('quantity'), last_id=Max('id'))
+        .values_list('product_id', 'delta', 'last_id')
+    )
+    return {product_id: (delta, last_id) for product_id, delta, last_id in rows}
+
+
+def projected_stock():
+    """Stock of every product with movements, computed from snapshots plus the unfolded tail."""
+    stock = dict(InventorySnapshot.objects.values_list('product_id', 'stock'))
+    for product_id, (delta, last_id) in _pending_deltas().items():
+        stock[product_id] = stock.get(product_id, 0) + delta
+    return stock
+
+
+def compact(prune_before=None, batch_size=1000):
+    """Fold unfolded movements into the per-product snapshots.
+
+    Movements older than ``prune_before`` that are already covered by a
+    snapshot are deleted. Returns ``(snapshots_written, movements_pruned)``.
+    """
+    with transaction.atomic():
+        pending = _pending_deltas()
+        current = dict(
+            InventorySnapshot.objects.filter(product_id__in=pending).values_list('product_id', 'stock')
+        )
+        snapshots = [
+            InventorySnapshot(product_id=product_id, stock=current.get(product_id, 0) + delta, last_movement_id=last_id)
+            for product_id, (delta, last_id) in pending.items()
+        ]
+        InventorySnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['stock', 'last_movement_id', 'updated_at'],
+        )
+
+    pruned = 0
+    if prune_before is not None:
+        last_folded = InventorySnapshot.objects.filter(product=OuterRef('product')).values('last_movement_id')
+        folded = InventoryMovement.objects.filter(created_at__lt=prune_before, id__lte=Subquery(last_folded))
+        while True:
+            with transaction.atomic():
+                ids = list(folded.order_by('id').values_list('id', flat=True)[:batch_size])
+                InventoryMovement.objects.filter(id__in=ids).delete()
+            pruned += len(ids)
+            if len(ids) < batch_size:
+                break
+    return len(snapshots), pruned
+
+
+def verify_warehouses():
+    """Products whose ``stock`` isn't the sum of their warehouse stock, as ``(product_id, stock, total)``."""
+    totals = dict(
+        WarehouseStock.objects.values('product_id').annotate(total=Sum('quantity'))
+        .order_by().values_list('product_id', 'total')
+    )
+    return [
+        (product_id, stock, totals.get(product_id, 0))
+        for product_id, stock in Product.objects.values_list('pk', 'stock').iterator()
+        if stock != totals.get(product_id, 0)
+    ]
+
+
+def verify(fix=False, batch_size=500):
+    """Compare ``Product.stock`` with the ledger projection for every product.
+
+    Returns a list of ``(product_id, cached, expected)`` mismatches. With
+    ``fix`` the cached column is overwritten with the projection, and the
+    product's warehouse stock is adjusted to add up to it in the same
+    transaction -- additions at the default warehouse, removals allocated
+    as by ``_place`` -- without appending to the ledger, which is already
+    right.
+    """
+    expected = projected_stock()
+    mismatches = [
+        (product_id, cached, expected.get(product_id, 0))
+        for product_id, cached in Product.objects.values_list('pk', 'stock').iterator()
+        if cached != expected.get(product_id, 0)
+    ]
+    if fix:
+        for start in range(0, len(mismatches), batch_size):
+            chunk = mismatches[start:start + batch_size]
+            product_ids = [row[0] for row in chunk]
+            with transaction.atomic():
+                stored = {
+                    product_id: sum(stock.values()) for product_id, stock in _locked_stock(product_ids).items()
+                }
+                _apply_warehouse_totals(_place([
+                    InventoryMovement(product_id=product_id, kind=InventoryMovement.ADJUSTMENT,
+                                      quantity=value - stored.get(product_id, 0), note='verify_inventory --fix')
+                    for product_id, _, value in chunk if value != stored.get(product_id, 0)
+                ]))
+                Product.objects.filter(pk__in=product_ids).update(stock=Case(
+                    *[When(pk=product_id, then=Value(value)) for product_id, _, value in chunk],
+                    output_field=IntegerField(),
+                ), updated_at=timezone.now())
+                refresh_products(product_ids)
+    return mismatches
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import Product, ProductImage, ProductListing
+
+
+LISTING_UPDATE_FIELDS = [
+    'name', 'slug', 'category', 'category_name', 'price', 'stock', 'in_stock',
+    'is_available', 'featured', 'color', 'material', 'primary_image', 'created_at',
+]
+
+
+def _listing_source(queryset):
+    primary_image = ProductImage.objects.filter(
+        product=OuterRef('pk'), is_primary=True
+    ).order_by('created_at').values('image')[:1]
+    return queryset.select_related('category').annotate(primary_image_name=Subquery(primary_image))
+
+
+def _build_listing(product):
+    return ProductListing(
+        product_id=product.pk,
+        name=product.name,
+        slug=product.slug,
+        category_id=product.category_id,
+        category_name=product.category.name,
+        price=product.price,
+        stock=product.stock,
+        in_stock=product.in_stock,
+        is_available=product.is_available,
+        featured=product.featured,
+        color=product.color,
+        material=product.material,
+        primary_image=product.primary_image_name or '',
+        created_at=product.created_at,
+    )
+
+
+def _upsert(listings):
+    if listings:
+        ProductListing.objects.bulk_create(
+            listings,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=LISTING_UPDATE_FIELDS,
+        )
+
+
+def refresh_products(product_ids):
+    """Re-project the given products into the listing table."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    with transaction.atomic():
+        products = list(_listing_source(Product.objects.filter(pk__in=product_ids)))
+        _upsert([_build_listing(product) for product in products])
+        missing = product_ids - {product.pk for product in products}
+        if missing:
+            ProductListing.objects.filter(product_id__in=missing).delete()
+
+
+def refresh_category(category):
+    """Propagate a category rename to every listing row in it."""
+    ProductListing.objects.filter(category=category).exclude(
+        category_name=category.name
+    ).update(category_name=category.name)
+
+
+def rebuild_listing(batch_size=1000):
+    """Rebuild the whole listing table from the source tables.
+
+    Returns the number of rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        ProductListing.objects.all().delete()
+        batch = []
+        for product in _listing_source(Product.objects.order_by('pk')).iterator(chunk_size=batch_size):
+            batch.append(_build_listing(product))
+            if len(batch) >= batch_size:
+                ProductListing.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            ProductListing.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.pricing import next_change, run_due
+
+
+class Command(BaseCommand):
+    help = ('Apply price lists whose start time has passed and revert those that have ended. '
+            'Run it from cron every minute, or keep it running with --loop to switch prices on time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, waking up when the next price list starts or ends')
+        parser.add_argument('--max-sleep', type=float, default=60,
+                            help='With --loop, seconds to wait at most before checking for new lists')
+
+    def apply(self):
+        for price_list, action, products in run_due():
+            if action == 'skipped':
+                self.stdout.write(self.style.WARNING(f'{price_list}: ended before it was applied; skipped'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{price_list}: {action}, {products} products repriced'))
+
+    def handle(self, *args, **options):
+        self.apply()
+        while options['loop']:
+            now = timezone.now()
+            upcoming = next_change(now)
+            wait = options['max_sleep'] if upcoming is None else (upcoming - now).total_seconds()
+            time.sleep(min(max(wait, 0), options['max_sleep']))
+            self.apply()
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from store.archive import archivable_orders, archive_after_days, archive_orders
+
+
+class Command(BaseCommand):
+    help = ('Move delivered and canceled orders that have not changed for a while into the '
+            'archive tables, in batches')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive orders unchanged for this many days (default: ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would move')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days'] if options['days'] is not None else archive_after_days())
+        if options['dry_run']:
+            self.stdout.write(f'{archivable_orders(older_than).count()} orders would be archived')
+            return
+        archived = archive_orders(older_than, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} orders'))
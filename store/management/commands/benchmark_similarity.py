@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from store.similarity import COLORS, MATERIALS, ProductFeatureIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the similar-products index on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--categories', type=int, default=9)
+        parser.add_argument('--queries', type=int, default=256)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--chunk-size', type=int, default=64)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n = options['products']
+        ids = np.arange(1, n + 1)
+        category_ids = rng.integers(1, options['categories'] + 1, n)
+        colors = np.array(COLORS + [''])[rng.integers(0, len(COLORS) + 1, n)]
+        materials = np.array(MATERIALS + [''])[rng.integers(0, len(MATERIALS) + 1, n)]
+        prices = np.round(rng.lognormal(6, 0.8, n), 2) + 0.01
+
+        index = ProductFeatureIndex()
+        started = time.perf_counter()
+        index.load(ids, category_ids, colors, materials, prices)
+        self.stdout.write(f'Built index of {n} products x {index.features.shape[1]} features '
+                          f'in {time.perf_counter() - started:.2f}s '
+                          f'({index.features.nbytes / 2**20:.0f} MiB)')
+
+        updated = rng.choice(ids, 1000, replace=False)
+        started = time.perf_counter()
+        index.upsert(updated, category_ids[updated - 1], colors[updated - 1], materials[updated - 1],
+                     prices[updated - 1] * 0.9)
+        self.stdout.write(f'Upserted 1000 products in {(time.perf_counter() - started) * 1000:.1f}ms')
+
+        queries = rng.choice(ids, options['queries'], replace=False).tolist()
+        for metric in ('cosine', 'euclidean'):
+            started = time.perf_counter()
+            index.neighbours(queries, k=options['k'], metric=metric, chunk_size=options['chunk_size'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{metric}: {len(queries)} queries in {elapsed:.2f}s '
+                              f'({elapsed / len(queries) * 1000:.2f}ms/query)')
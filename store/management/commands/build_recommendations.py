@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from store.recommendations import update_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Update "frequently bought together" recommendations from new orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from the whole order history')
+        parser.add_argument('--top-k', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        processed = update_recommendations(
+            full=options['full'], k=options['top_k'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} orders'))
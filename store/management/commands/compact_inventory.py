@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.inventory import compact
+
+
+class Command(BaseCommand):
+    help = 'Fold inventory movements into per-product snapshots and prune old folded movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune-days', type=int, default=None,
+                            help='Delete folded movements older than this many days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        prune_before = None
+        if options['prune_days'] is not None:
+            prune_before = timezone.now() - timedelta(days=options['prune_days'])
+        snapshots, pruned = compact(prune_before=prune_before, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated {snapshots} snapshots, pruned {pruned} movements'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from store.media import dedupe
+
+
+def _size(num_bytes):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if num_bytes < 1024 or unit == 'GiB':
+            return f'{num_bytes:.1f} {unit}' if unit != 'B' else f'{num_bytes} B'
+        num_bytes /= 1024
+
+
+class Command(BaseCommand):
+    help = ('Hash every file under MEDIA_ROOT, move it to its content-hash name, merge duplicates '
+            'and rebuild the media reference counts. Pause uploads while it runs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Threads used for hashing')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Also delete files that no product image or category references')
+        parser.add_argument('--dry-run', action='store_true', help='Report without changing anything')
+
+    def handle(self, *args, **options):
+        report = dedupe(workers=options['workers'], delete_orphans=options['delete_orphans'],
+                        dry_run=options['dry_run'])
+        prefix = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(
+            f'Scanned {report.files} files ({_size(report.bytes)}): {report.duplicates} duplicates, '
+            f'{report.renamed} renamed to content-hash names, {report.orphans} unreferenced'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {_size(report.reclaimed)}'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from store.pricing import create_price_list, read_entries
+
+
+class Command(BaseCommand):
+    help = ('Schedule a price list from a CSV file with "product" (id or slug) and "price" columns; '
+            'apply_price_lists switches the prices at --starts and back at --ends')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--name', required=True)
+        parser.add_argument('--starts', required=True, help='ISO 8601 start time')
+        parser.add_argument('--ends', help='ISO 8601 end time; omit to keep the prices')
+
+    def parse_time(self, value, option):
+        moment = parse_datetime(value) if value else None
+        if value and moment is None:
+            raise CommandError(f'{option}: {value!r} is not an ISO 8601 date and time')
+        if moment is not None and timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def handle(self, *args, **options):
+        starts_at = self.parse_time(options['starts'], '--starts')
+        ends_at = self.parse_time(options['ends'], '--ends')
+        if ends_at is not None and ends_at <= starts_at:
+            raise CommandError('--ends must be after --starts')
+        try:
+            with open(options['path'], newline='') as f:
+                prices = read_entries(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'{options["path"]}: {exc}')
+        price_list = create_price_list(options['name'], starts_at, ends_at, prices)
+        self.stdout.write(self.style.SUCCESS(
+            f'Scheduled {price_list} with {len(prices)} prices from {starts_at:%Y-%m-%d %H:%M %Z}'
+        ))
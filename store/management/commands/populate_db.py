@@ -3,7 +3,8 @@ from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 from decimal import Decimal
 import random
-from store.models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem
+from store.models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem, InventoryMovement
+from store import inventory
 
 User = get_user_model()
 
@@ -175,7 +176,7 @@ class Command(BaseCommand):
                                          f"Perfect for modern homes and offices. Features durable construction, elegant design, "
                                          f"and excellent comfort. Available in {product_data.get('color', 'multiple colors')} color.",
                             'price': Decimal(str(product_data['price'])),
-                            'stock': product_data['stock'],
+                            'stock': 0,
                             'is_available': True,
                             'featured': i < 2,  # First 2 products in each category are featured
                             'color': product_data.get('color', ''),
@@ -184,6 +185,8 @@ class Command(BaseCommand):
                     )
                     all_products.append(product)
                     if created:
+                        inventory.record(product, InventoryMovement.RESTOCK, product_data['stock'], note='Sample data')
+                        product.refresh_from_db(fields=['stock'])
                         self.stdout.write(self.style.SUCCESS(f'Product created: {product.name}'))
         
         # Create sample orders for users
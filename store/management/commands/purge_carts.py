@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from store.carts import purge_stale_carts, stale_cart_days, stale_carts
+
+
+class Command(BaseCommand):
+    help = ('Delete carts (with their items and stock holds) untouched for a number of days, '
+            'in short batches that are safe to run alongside live traffic')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Purge carts untouched for this many days (default: STALE_CART_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to sleep between batches so requests can write')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the carts that would go')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days'] if options['days'] is not None else stale_cart_days())
+        if options['dry_run']:
+            self.stdout.write(f'{stale_carts(older_than).count()} carts would be purged')
+            return
+
+        def progress(carts, items):
+            if options['verbosity'] > 0:
+                self.stdout.write(f'... {carts} carts, {items} items')
+
+        carts, items = purge_stale_carts(
+            older_than, batch_size=options['batch_size'], pause=options['pause'], progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f'Purged {carts} carts and {items} cart items'))
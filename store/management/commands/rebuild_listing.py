@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.listing import rebuild_listing
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized product listing table from products, categories and images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_listing(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} listing rows'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.inventory import read_quantities, restock
+from store.models import Warehouse
+
+
+class Command(BaseCommand):
+    help = ('Add stock to one warehouse from a CSV file with "product" (id or slug) and "quantity" '
+            'columns, in a single transaction')
+
+    def add_arguments(self, parser):
+        parser.add_argument('warehouse', help='Warehouse code')
+        parser.add_argument('path')
+        parser.add_argument('--note', default='', help='Stored on every inventory movement')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        warehouse = Warehouse.objects.filter(code=options['warehouse']).first()
+        if warehouse is None:
+            raise CommandError(f'No warehouse with code {options["warehouse"]!r}')
+        try:
+            with open(options['path'], newline='') as f:
+                quantities = read_quantities(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'{options["path"]}: {exc}')
+        units = restock(warehouse, quantities, note=options['note'] or f'Restock from {options["path"]}',
+                        batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Added {units} units of {len(quantities)} products to {warehouse}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.archive import restore_orders
+from store.models import ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = 'Move archived orders back into the order tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_numbers', nargs='*')
+        parser.add_argument('--user', help='Restore every archived order of this username')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not options['order_numbers'] and not options['user']:
+            raise CommandError('Pass order numbers or --user')
+        orders = ArchivedOrder.objects.all()
+        if options['order_numbers']:
+            orders = orders.filter(order_number__in=options['order_numbers'])
+            missing = set(options['order_numbers']) - set(orders.values_list('order_number', flat=True))
+            if missing:
+                raise CommandError(f'Not in the archive: {", ".join(sorted(missing))}')
+        if options['user']:
+            orders = orders.filter(user__username=options['user'])
+        restored = restore_orders(orders, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Restored {restored} orders'))
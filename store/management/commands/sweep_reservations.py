@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.reservations import sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Release expired cart stock reservations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        released = sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations'))
@@ -0,0 +1,59 @@
+import os
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.images import IMAGE_EXTENSIONS, ImageRejected, ImageUpload, import_images, read_zip
+
+
+class Command(BaseCommand):
+    help = ('Attach many images to products at once. Paths may be image files (with --product), '
+            'zip archives or directories; inside archives and directories, images go in folders '
+            'named after the product id or slug unless --product is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--product', help='Product id or slug for every image')
+        parser.add_argument('--primary', action='append', default=[],
+                            help='File name (or folder/file name) to make primary; repeatable')
+        parser.add_argument('--workers', type=int, default=4, help='Threads used to decode and validate images')
+
+    def directory_uploads(self, root, product, primary):
+        for directory, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                path = os.path.join(directory, filename)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                key = product or os.path.basename(directory)
+                if directory == root and not product:
+                    raise CommandError(f'{path}: put images in a folder named after the product or pass --product')
+                with open(path, 'rb') as f:
+                    yield ImageUpload(key, relative, f.read(), primary=relative in primary or filename in primary)
+
+    def handle(self, *args, **options):
+        product, primary = options['product'], set(options['primary'])
+        uploads = []
+        try:
+            for path in options['paths']:
+                if os.path.isdir(path):
+                    uploads.extend(self.directory_uploads(path, product, primary))
+                elif zipfile.is_zipfile(path):
+                    with open(path, 'rb') as f:
+                        uploads.extend(read_zip(f, product, primary))
+                elif product:
+                    with open(path, 'rb') as f:
+                        name = os.path.basename(path)
+                        uploads.append(ImageUpload(product, name, f.read(), primary=name in primary))
+                else:
+                    raise CommandError(f'{path}: pass --product for individual image files')
+            created, errors = import_images(uploads, workers=options['workers'])
+        except (ImageRejected, OSError) as exc:
+            raise CommandError(str(exc))
+
+        for name, message in errors:
+            self.stderr.write(f'{name}: {message}')
+        primaries = sum(image.is_primary for image in created)
+        self.stdout.write(self.style.SUCCESS(
+            f'Added {len(created)} images ({primaries} set as primary), skipped {len(errors)}'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.inventory import verify, verify_warehouses
+
+
+class Command(BaseCommand):
+    help = ('Recompute stock from the inventory ledger and compare it with Product.stock, '
+            'and check that Product.stock is the sum of the warehouse stock')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Overwrite Product.stock with the ledger value and adjust warehouse stock to match')
+
+    def handle(self, *args, **options):
+        mismatches = verify(fix=options['fix'])
+        for product_id, cached, expected in mismatches:
+            self.stdout.write(f'Product {product_id}: stock={cached} ledger={expected}')
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('All products match the ledger'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(mismatches)} products'))
+        split = verify_warehouses()
+        for product_id, stock, total in split:
+            self.stdout.write(f'Product {product_id}: stock={stock} warehouses={total}')
+        if not split:
+            self.stdout.write(self.style.SUCCESS('All products match their warehouse stock'))
+        if (mismatches and not options['fix']) or split:
+            raise CommandError(f'{len(mismatches)} products differ from the ledger, '
+                               f'{len(split)} from their warehouse stock')
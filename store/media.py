@@ -0,0 +1,170 @@
+import hashlib
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .listing import refresh_products
+from .models import Category, MediaFile, Product, ProductImage
+from .storage import INCOMING_DIR, canonical_name
+
+# Every model field whose files live in the default storage.
+MEDIA_FIELDS = [(ProductImage, 'image'), (Category, 'image')]
+
+
+def claim(name, sha256, size):
+    """Count one more reference to the stored file ``name``."""
+    with transaction.atomic():
+        if MediaFile.objects.filter(name=name).update(refcount=F('refcount') + 1):
+            return
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, sha256=sha256, size=size, refcount=1)
+        except IntegrityError:
+            MediaFile.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop one reference to ``name`` and delete the file with the last one.
+
+    Files without a MediaFile row (uploaded before reference counting, or
+    never claimed) are left alone; ``dedupe_media`` adopts them.
+    """
+    if not name:
+        return
+    with transaction.atomic():
+        if not MediaFile.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1):
+            return
+        if MediaFile.objects.filter(name=name, refcount=0).delete()[0]:
+            default_storage.delete(name)
+
+
+def release_on_commit(name):
+    if name:
+        transaction.on_commit(lambda: release(name))
+
+
+def stored_name(value):
+    """The storage name behind a file field's raw attribute value."""
+    return getattr(value, 'name', value) or ''
+
+
+@dataclass
+class DedupeReport:
+    files: int = 0
+    bytes: int = 0
+    renamed: int = 0
+    duplicates: int = 0
+    orphans: int = 0
+    reclaimed: int = 0
+
+
+def _media_files(root):
+    for directory, dirnames, filenames in os.walk(root):
+        if directory == root and INCOMING_DIR in dirnames:
+            dirnames.remove(INCOMING_DIR)
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            yield os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest(), os.fstat(f.fileno()).st_size
+
+
+def _references():
+    references = defaultdict(list)
+    for model, field in MEDIA_FIELDS:
+        for pk, name in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list('pk', field):
+            references[name].append((model, field, pk))
+    return references
+
+
+def _link(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _repoint(names, canonical, references):
+    """Point every row referencing ``names`` at ``canonical`` and bump the affected products."""
+    now = timezone.now()
+    product_ids = set()
+    for model, field in MEDIA_FIELDS:
+        pks = [pk for name in names for ref_model, ref_field, pk in references.get(name, ())
+               if ref_model is model and ref_field == field]
+        if not pks:
+            continue
+        model.objects.filter(pk__in=pks).update(**{field: canonical, 'updated_at': now})
+        if model is ProductImage:
+            product_ids.update(ProductImage.objects.filter(pk__in=pks).values_list('product_id', flat=True))
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update(updated_at=now)
+        refresh_products(product_ids)
+
+
+def dedupe(workers=8, delete_orphans=False, dry_run=False):
+    """Rename every file under MEDIA_ROOT to its content-hash name and merge duplicates.
+
+    Files are hashed in a pool of ``workers`` threads. Rows referencing a
+    renamed or duplicate file are repointed at the canonical name, the
+    MediaFile reference counts are rebuilt from the rows, and the redundant
+    copies are deleted. Files no row references are only removed with
+    ``delete_orphans``. Meant to run while uploads are paused.
+    """
+    root = settings.MEDIA_ROOT
+    report = DedupeReport()
+    names = list(_media_files(root))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = dict(zip(names, pool.map(lambda name: _hash_file(os.path.join(root, name)), names)))
+
+    groups = defaultdict(list)
+    for name, (sha256, size) in hashes.items():
+        groups[canonical_name(name, sha256)].append(name)
+        report.files += 1
+        report.bytes += size
+
+    references = _references()
+    seen = set()
+    for canonical, members in groups.items():
+        sha256, size = hashes[members[0]]
+        refcount = sum(len(references.get(name, ())) for name in members)
+        if not refcount:
+            report.orphans += len(members)
+            if delete_orphans:
+                report.reclaimed += size * len(members)
+                if not dry_run:
+                    for name in members:
+                        os.remove(os.path.join(root, name))
+            continue
+        seen.add(canonical)
+        redundant = [name for name in members if name != canonical]
+        report.duplicates += len(members) - 1
+        report.reclaimed += size * (len(members) - 1)
+        if canonical not in members:
+            report.renamed += 1
+        if dry_run:
+            continue
+        if canonical not in members:
+            _link(os.path.join(root, members[0]), os.path.join(root, canonical))
+        with transaction.atomic():
+            _repoint(redundant, canonical, references)
+            MediaFile.objects.update_or_create(
+                name=canonical, defaults={'sha256': sha256, 'size': size, 'refcount': refcount}
+            )
+        for name in redundant:
+            os.remove(os.path.join(root, name))
+
+    if not dry_run:
+        MediaFile.objects.exclude(name__in=seen).delete()
+    return report
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='store.product')),
+                ('name', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200)),
+                ('category_name', models.CharField(max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('in_stock', models.BooleanField(default=False)),
+                ('is_available', models.BooleanField(default=True)),
+                ('featured', models.BooleanField(default=False)),
+                ('color', models.CharField(blank=True, max_length=20)),
+                ('material', models.CharField(blank=True, max_length=20)),
+                ('primary_image', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('category', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.category')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['is_available', '-created_at'], name='listing_avail_created_idx'), models.Index(fields=['is_available', 'price'], name='listing_avail_price_idx'), models.Index(fields=['is_available', 'name'], name='listing_avail_name_idx'), models.Index(fields=['is_available', 'category', '-created_at'], name='listing_cat_created_idx'), models.Index(fields=['is_available', 'category', 'price'], name='listing_cat_price_idx'), models.Index(fields=['is_available', 'featured', '-created_at'], name='listing_featured_created_idx'), models.Index(fields=['is_available', 'color', '-created_at'], name='listing_color_created_idx'), models.Index(fields=['is_available', 'material', '-created_at'], name='listing_material_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """Seed the ledger with the stock that existed before it did."""
+    Product = apps.get_model('store', 'Product')
+    InventoryMovement = apps.get_model('store', 'InventoryMovement')
+    InventoryMovement.objects.bulk_create(
+        InventoryMovement(product_id=product_id, kind='adjustment', quantity=stock, note='Opening balance')
+        for product_id, stock in Product.objects.filter(stock__gt=0).values_list('pk', 'stock').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory_snapshot', serialize=False, to='store.product')),
+                ('stock', models.IntegerField(default=0)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('restock', 'Restock'), ('adjustment', 'Adjustment'), ('cancel_return', 'Cancel return')], max_length=20)),
+                ('quantity', models.IntegerField(help_text='Signed change applied to stock')),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movements', to='store.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='store.product')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['product', 'id'], name='store_inven_product_f36e7e_idx'), models.Index(fields=['created_at'], name='store_inven_created_f606dc_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
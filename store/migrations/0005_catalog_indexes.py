@@ -0,0 +1,187 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_inventory_ledger'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='store_order_order_n_317f52_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='store_produ_slug_361302_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='store_produ_categor_2f0f44_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_avail_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_avail_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_avail_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_cat_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_cat_price_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_featured_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_color_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productlisting',
+            name='listing_material_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='category_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='store_order_user_id_1fd99b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-created_at'], name='product_avail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['price'], name='product_avail_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['name'], name='product_avail_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', '-created_at'], name='product_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'price'], name='product_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'name'], name='product_cat_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['color', '-created_at'], name='product_color_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['color', 'price'], name='product_color_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['color', 'name'], name='product_color_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['material', '-created_at'], name='product_material_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['material', 'price'], name='product_material_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['material', 'name'], name='product_material_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('featured', True), ('is_available', True)), fields=['-created_at'], name='product_featured_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('featured', True), ('is_available', True)), fields=['price'], name='product_featured_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('featured', True), ('is_available', True)), fields=['name'], name='product_featured_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-created_at'], name='listing_avail_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['price'], name='listing_avail_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['name'], name='listing_avail_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', '-created_at'], name='listing_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'price'], name='listing_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'name'], name='listing_cat_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['color', '-created_at'], name='listing_color_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['color', 'price'], name='listing_color_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['color', 'name'], name='listing_color_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['material', '-created_at'], name='listing_material_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['material', 'price'], name='listing_material_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['material', 'name'], name='listing_material_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('featured', True), ('is_available', True)), fields=['-created_at'], name='listing_featured_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('featured', True), ('is_available', True)), fields=['price'], name='listing_featured_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productlisting',
+            index=models.Index(condition=models.Q(('featured', True), ('is_available', True)), fields=['name'], name='listing_featured_name_idx'),
+        ),
+    ]
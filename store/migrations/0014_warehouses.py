@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_main_warehouse(apps, schema_editor):
+    """Move the stock that existed before warehouses into a single one."""
+    Warehouse = apps.get_model('store', 'Warehouse')
+    WarehouseStock = apps.get_model('store', 'WarehouseStock')
+    Product = apps.get_model('store', 'Product')
+    InventoryMovement = apps.get_model('store', 'InventoryMovement')
+    main = Warehouse.objects.create(name='Main warehouse', code='main')
+    WarehouseStock.objects.bulk_create(
+        (WarehouseStock(warehouse=main, product_id=product_id, quantity=stock)
+         for product_id, stock in Product.objects.filter(stock__gt=0).values_list('pk', 'stock').iterator()),
+        batch_size=1000,
+    )
+    InventoryMovement.objects.update(warehouse=main)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_price_lists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Warehouse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('code', models.SlugField(unique=True)),
+                ('priority', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['priority', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='inventorymovement',
+            name='warehouse',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='store.warehouse'),
+        ),
+        migrations.CreateModel(
+            name='WarehouseStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='warehouse_stock', to='store.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock', to='store.warehouse')),
+            ],
+            options={
+                'unique_together': {('product', 'warehouse')},
+            },
+        ),
+        migrations.RunPython(open_main_warehouse, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -12,6 +13,7 @@ class Category(models.Model):
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -25,6 +27,10 @@ class Category(models.Model):
         verbose_name = 'Category'
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='category_active_name_idx'),
+            models.Index(fields=['updated_at'], name='category_updated_idx'),
+        ]
 
 
 class Product(models.Model):
@@ -51,6 +57,7 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     stock = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0, editable=False)
     is_available = models.BooleanField(default=True)
     featured = models.BooleanField(default=False)
     color = models.CharField(max_length=20, choices=COLOR_CHOICES, blank=True)
@@ -72,9 +79,27 @@ class Product(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # One partial index per ProductListView filter and ordering (see check_query_plans).
+        # SQLite compiles is_available=True to a bare column test, which only a
+        # partial index with the same condition can satisfy.
         indexes = [
-            models.Index(fields=['slug']),
-            models.Index(fields=['category', 'is_available']),
+            models.Index(fields=['-created_at'], condition=models.Q(is_available=True), name='product_avail_created_idx'),
+            models.Index(fields=['price'], condition=models.Q(is_available=True), name='product_avail_price_idx'),
+            models.Index(fields=['name'], condition=models.Q(is_available=True), name='product_avail_name_idx'),
+            models.Index(fields=['category', '-created_at'], condition=models.Q(is_available=True), name='product_cat_created_idx'),
+            models.Index(fields=['category', 'price'], condition=models.Q(is_available=True), name='product_cat_price_idx'),
+            models.Index(fields=['category', 'name'], condition=models.Q(is_available=True), name='product_cat_name_idx'),
+            models.Index(fields=['color', '-created_at'], condition=models.Q(is_available=True), name='product_color_created_idx'),
+            models.Index(fields=['color', 'price'], condition=models.Q(is_available=True), name='product_color_price_idx'),
+            models.Index(fields=['color', 'name'], condition=models.Q(is_available=True), name='product_color_name_idx'),
+            models.Index(fields=['material', '-created_at'], condition=models.Q(is_available=True), name='product_material_created_idx'),
+            models.Index(fields=['material', 'price'], condition=models.Q(is_available=True), name='product_material_price_idx'),
+            models.Index(fields=['material', 'name'], condition=models.Q(is_available=True), name='product_material_name_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_available=True, featured=True), name='product_featured_created_idx'),
+            models.Index(fields=['price'], condition=models.Q(is_available=True, featured=True), name='product_featured_price_idx'),
+            models.Index(fields=['name'], condition=models.Q(is_available=True, featured=True), name='product_featured_name_idx'),
+            # Catalog change feed polled by the in-process indexes.
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
         ]
 
 
@@ -83,10 +108,13 @@ class ProductImage(models.Model):
     image = models.ImageField(upload_to='products/')
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def save(self, *args, **kwargs):
         if self.is_primary:
-            ProductImage.objects.filter(product=self.product, is_primary=True).exclude(pk=self.pk).update(is_primary=False)
+            ProductImage.objects.filter(product=self.product, is_primary=True).exclude(pk=self.pk).update(
+                is_primary=False, updated_at=timezone.now()
+            )
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -96,6 +124,102 @@ class ProductImage(models.Model):
         ordering = ['-is_primary', 'created_at']
 
 
+class ProductListing(models.Model):
+    """Flattened, denormalized copy of what ProductListSerializer renders.
+
+    Maintained by the signal handlers in store.signals and rebuilt in bulk by
+    the ``rebuild_listing`` management command.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', db_index=False)
+    category_name = models.CharField(max_length=100)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    stock = models.PositiveIntegerField(default=0)
+    in_stock = models.BooleanField(default=False)
+    is_available = models.BooleanField(default=True)
+    featured = models.BooleanField(default=False)
+    color = models.CharField(max_length=20, blank=True)
+    material = models.CharField(max_length=20, blank=True)
+    primary_image = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(is_available=True), name='listing_avail_created_idx'),
+            models.Index(fields=['price'], condition=models.Q(is_available=True), name='listing_avail_price_idx'),
+            models.Index(fields=['name'], condition=models.Q(is_available=True), name='listing_avail_name_idx'),
+            models.Index(fields=['category', '-created_at'], condition=models.Q(is_available=True), name='listing_cat_created_idx'),
+            models.Index(fields=['category', 'price'], condition=models.Q(is_available=True), name='listing_cat_price_idx'),
+            models.Index(fields=['category', 'name'], condition=models.Q(is_available=True), name='listing_cat_name_idx'),
+            models.Index(fields=['color', '-created_at'], condition=models.Q(is_available=True), name='listing_color_created_idx'),
+            models.Index(fields=['color', 'price'], condition=models.Q(is_available=True), name='listing_color_price_idx'),
+            models.Index(fields=['color', 'name'], condition=models.Q(is_available=True), name='listing_color_name_idx'),
+            models.Index(fields=['material', '-created_at'], condition=models.Q(is_available=True), name='listing_material_created_idx'),
+            models.Index(fields=['material', 'price'], condition=models.Q(is_available=True), name='listing_material_price_idx'),
+            models.Index(fields=['material', 'name'], condition=models.Q(is_available=True), name='listing_material_name_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_available=True, featured=True), name='listing_featured_created_idx'),
+            models.Index(fields=['price'], condition=models.Q(is_available=True, featured=True), name='listing_featured_price_idx'),
+            models.Index(fields=['name'], condition=models.Q(is_available=True, featured=True), name='listing_featured_name_idx'),
+        ]
+
+
+class PriceList(models.Model):
+    """A set of product prices in force between ``starts_at`` and ``ends_at``.
+
+    Applied and reverted by ``store.pricing.run_due`` (the
+    ``apply_price_lists`` command), which writes the prices to
+    ``Product.price`` so carts, checkout and the catalog all read them.
+    """
+    SCHEDULED = 'scheduled'
+    ACTIVE = 'active'
+    ENDED = 'ended'
+    STATUS_CHOICES = [
+        (SCHEDULED, 'Scheduled'),
+        (ACTIVE, 'Active'),
+        (ENDED, 'Ended'),
+    ]
+
+    name = models.CharField(max_length=200)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(blank=True, null=True, help_text='Leave empty to keep the prices')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=SCHEDULED, editable=False)
+    activated_at = models.DateTimeField(blank=True, null=True, editable=False)
+    ended_at = models.DateTimeField(blank=True, null=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['-starts_at']
+        indexes = [
+            models.Index(fields=['status', 'starts_at']),
+            models.Index(fields=['status', 'ends_at']),
+        ]
+
+
+class PriceListEntry(models.Model):
+    price_list = models.ForeignKey(PriceList, on_delete=models.CASCADE, related_name='entries')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_list_entries')
+    price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
+    # The product's price when the list was applied; null while scheduled, or when the
+    # product was already in another active list and so was left alone.
+    previous_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+
+    def __str__(self):
+        return f"{self.product.name} at {self.price} ({self.price_list.name})"
+
+    class Meta:
+        verbose_name_plural = 'Price List Entries'
+        unique_together = ('price_list', 'product')
+
+
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
     updated_at = models.DateTimeField(auto_now=True)
@@ -115,6 +239,9 @@ class Cart(models.Model):
     class Meta:
         verbose_name = 'Shopping Cart'
         verbose_name_plural = 'Shopping Carts'
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
 
 
 class CartItem(models.Model):
@@ -134,6 +261,23 @@ class CartItem(models.Model):
         ordering = ['-added_at']
 
 
+class StockReservation(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held by cart {self.cart_id}"
+
+    class Meta:
+        unique_together = ('cart', 'product')
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -167,8 +311,10 @@ class Order(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['order_number']),
+            models.Index(fields=['user', 'created_at']),
             models.Index(fields=['user', 'status']),
+            # Terminal orders that have gone quiet, for store.archive.
+            models.Index(fields=['status', 'updated_at']),
         ]
 
 
@@ -186,3 +332,172 @@ class OrderItem(models.Model):
     
     class Meta:
         ordering = ['id']
+
+
+class ArchivedOrder(models.Model):
+    """An Order moved out of the hot tables by ``store.archive``; keeps its id."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_orders')
+    order_number = models.CharField(max_length=50, unique=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    shipping_address = models.TextField()
+    phone = models.CharField(max_length=20)
+    notes = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order {self.order_number} (archived)"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_order_items')
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def get_total_price(self):
+        return self.price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} for Order {self.order.order_number}"
+
+    class Meta:
+        ordering = ['id']
+
+
+class Warehouse(models.Model):
+    """A location stock is kept in; orders are filled from lower ``priority`` first."""
+    name = models.CharField(max_length=200)
+    code = models.SlugField(max_length=50, unique=True)
+    priority = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['priority', 'id']
+
+
+class WarehouseStock(models.Model):
+    """Units of a product at one warehouse; ``Product.stock`` is their sum.
+
+    Written only by ``store.inventory.apply_movements``, together with the
+    ledger and ``Product.stock``.
+    """
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name='stock')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='warehouse_stock')
+    quantity = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} at {self.warehouse_id}"
+
+    class Meta:
+        unique_together = ('product', 'warehouse')
+
+
+class InventoryMovement(models.Model):
+    """Append-only record of every change to a product's stock."""
+    SALE = 'sale'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    CANCEL_RETURN = 'cancel_return'
+
+    KIND_CHOICES = [
+        (SALE, 'Sale'),
+        (RESTOCK, 'Restock'),
+        (ADJUSTMENT, 'Adjustment'),
+        (CANCEL_RETURN, 'Cancel return'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text='Signed change applied to stock')
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='movements')
+    archived_order = models.ForeignKey(
+        ArchivedOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='movements'
+    )
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.PROTECT, null=True, blank=True, related_name='movements'
+    )
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.quantity:+d} x {self.product_id}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['product', 'id']),
+            models.Index(fields=['created_at']),
+        ]
+
+
+class InventorySnapshot(models.Model):
+    """Stock of a product folded up to and including ``last_movement_id``."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='inventory_snapshot')
+    stock = models.IntegerField(default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.stock} @ {self.last_movement_id}"
+
+
+class ProductCooccurrence(models.Model):
+    """Number of orders containing both ``product`` and ``other``."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'other')
+
+
+class ProductRecommendation(models.Model):
+    """Top-K "frequently bought together" neighbours of ``product``."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id} (#{self.rank})"
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = ('product', 'rank')
+
+
+class RecommendationState(models.Model):
+    """Single row remembering the last order folded into the co-occurrence counts."""
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class MediaFile(models.Model):
+    """A stored upload and the number of rows whose file fields point at it.
+
+    Written by store.storage.HashedMediaStorage, which names files after
+    their content so identical uploads share one file; the file is removed
+    when the last reference goes away (see store.media).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
@@ -0,0 +1,139 @@
+"""Applying and reverting scheduled price lists.
+
+A price list is applied by writing its prices to ``Product.price``, so the
+catalog, cart totals and checkout keep reading the one price column and
+always agree. Each activation or deactivation is a handful of set-based
+UPDATEs in one transaction, whatever the number of products: the old price
+is saved on every entry, the products get their new price and a fresh
+``updated_at`` -- which invalidates their cached fragments and is what the
+similarity and autocomplete indexes poll -- and the listing table is synced.
+
+A product keeps the first active list it is in; entries of later,
+overlapping lists are left unapplied. When a list ends, a product goes back
+to its previous price unless its price was changed meanwhile (e.g. by hand
+in the admin), in which case that change is kept.
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import PriceList, PriceListEntry, Product, ProductListing
+from .utils import resolve_products
+
+
+def _sync_listing(product_ids):
+    ProductListing.objects.filter(product_id__in=product_ids).update(
+        price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+
+
+def activate(price_list, now=None):
+    """Apply a scheduled ``price_list``; returns the number of products repriced."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        if not PriceList.objects.filter(pk=price_list.pk, status=PriceList.SCHEDULED).update(
+            status=PriceList.ACTIVE, activated_at=now
+        ):
+            return 0  # Applied or canceled meanwhile.
+        taken = PriceListEntry.objects.filter(
+            product=OuterRef('product'), price_list__status=PriceList.ACTIVE, previous_price__isnull=False,
+        ).exclude(price_list=price_list)
+        entries = price_list.entries.exclude(Exists(taken))
+        entries.update(previous_price=Subquery(Product.objects.filter(pk=OuterRef('product')).values('price')[:1]))
+        applied = price_list.entries.filter(previous_price__isnull=False)
+        repriced = Product.objects.filter(pk__in=applied.values('product')).update(
+            price=Subquery(applied.filter(product=OuterRef('pk')).values('price')[:1]),
+            updated_at=now,
+        )
+        _sync_listing(applied.values('product'))
+    price_list.status, price_list.activated_at = PriceList.ACTIVE, now
+    return repriced
+
+
+def deactivate(price_list, now=None):
+    """End an active ``price_list``; returns the number of products restored."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        if not PriceList.objects.filter(pk=price_list.pk, status=PriceList.ACTIVE).update(
+            status=PriceList.ENDED, ended_at=now
+        ):
+            return 0
+        applied = price_list.entries.filter(previous_price__isnull=False)
+        unchanged = applied.filter(product=OuterRef('pk'), price=OuterRef('price'))
+        restored = Product.objects.filter(Exists(unchanged)).update(
+            price=Subquery(applied.filter(product=OuterRef('pk')).values('previous_price')[:1]),
+            updated_at=now,
+        )
+        _sync_listing(applied.values('product'))
+    price_list.status, price_list.ended_at = PriceList.ENDED, now
+    return restored
+
+
+def run_due(now=None):
+    """End and start every price list whose time has come.
+
+    Lists are ended before others start, so a list can take over products
+    from one ending at the same moment. A scheduled list whose whole window
+    has passed is marked ended without being applied. Returns
+    ``[(price_list, 'activated' | 'ended' | 'skipped', products), ...]``.
+    """
+    now = now or timezone.now()
+    results = []
+    for price_list in PriceList.objects.filter(status=PriceList.ACTIVE, ends_at__lte=now).order_by('ends_at'):
+        results.append((price_list, 'ended', deactivate(price_list, now)))
+    due = PriceList.objects.filter(status=PriceList.SCHEDULED, starts_at__lte=now).order_by('starts_at', 'pk')
+    for price_list in due:
+        if price_list.ends_at is not None and price_list.ends_at <= now:
+            PriceList.objects.filter(pk=price_list.pk, status=PriceList.SCHEDULED).update(
+                status=PriceList.ENDED, ended_at=now
+            )
+            results.append((price_list, 'skipped', 0))
+        else:
+            results.append((price_list, 'activated', activate(price_list, now)))
+    return results
+
+
+def next_change(now=None):
+    """When the next scheduled start or end is due, or None."""
+    now = now or timezone.now()
+    upcoming = [
+        PriceList.objects.filter(status=PriceList.SCHEDULED)
+        .order_by('starts_at').values_list('starts_at', flat=True).first(),
+        PriceList.objects.filter(status=PriceList.ACTIVE, ends_at__isnull=False)
+        .order_by('ends_at').values_list('ends_at', flat=True).first(),
+    ]
+    upcoming = [moment for moment in upcoming if moment is not None]
+    return max(min(upcoming), now) if upcoming else None
+
+
+def read_entries(fileobj):
+    """``{product id: price}`` from a CSV with ``product`` (id or slug) and ``price`` columns.
+
+    Raises ValueError naming the first bad line.
+    """
+    rows = []
+    reader = csv.DictReader(fileobj)
+    for row in reader:
+        try:
+            price = Decimal(row['price'])
+        except (KeyError, TypeError, InvalidOperation):
+            raise ValueError(f'line {reader.line_num}: expected product and price columns')
+        if not price.is_finite() or price <= 0:
+            raise ValueError(f'line {reader.line_num}: price must be a positive number')
+        rows.append(((row.get('product') or '').strip(), price))
+    ids = resolve_products(key for key, _ in rows)
+    return {ids[key]: price for key, price in rows}
+
+
+def create_price_list(name, starts_at, ends_at, prices):
+    """A scheduled price list with ``prices`` (``{product id: price}``), written in one bulk insert."""
+    with transaction.atomic():
+        price_list = PriceList.objects.create(name=name, starts_at=starts_at, ends_at=ends_at)
+        PriceListEntry.objects.bulk_create([
+            PriceListEntry(price_list=price_list, product_id=product_id, price=price)
+            for product_id, price in prices.items()
+        ], batch_size=1000)
+    return price_list
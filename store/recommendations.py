@@ -0,0 +1,116 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Order, OrderItem, ProductCooccurrence, ProductRecommendation, RecommendationState,
+)
+
+
+def top_k():
+    return getattr(settings, 'RECOMMENDATIONS_TOP_K', 10)
+
+
+def _cooccurrence_deltas(rows):
+    """Pair counts for one batch of ``(order_id, product_id)`` rows.
+
+    Builds the binary order x product incidence matrix B and returns the
+    off-diagonal entries of B.T @ B as ``(product_ids, other_ids, counts)``.
+    """
+    orders, order_idx = np.unique(rows[:, 0], return_inverse=True)
+    products, product_idx = np.unique(rows[:, 1], return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (order_idx, product_idx)),
+        shape=(len(orders), len(products)),
+    )
+    incidence.data[:] = 1  # an order listing a product twice still counts once
+    pairs = (incidence.T @ incidence).tocoo()
+    off_diagonal = pairs.row != pairs.col
+    return products[pairs.row[off_diagonal]], products[pairs.col[off_diagonal]], pairs.data[off_diagonal]
+
+
+def _merge_counts(product_ids, other_ids, counts):
+    affected = np.unique(product_ids).tolist()
+    existing = {
+        (product_id, other_id): (pk, count)
+        for pk, product_id, other_id, count in ProductCooccurrence.objects.filter(
+            product_id__in=affected
+        ).values_list('pk', 'product_id', 'other_id', 'count')
+    }
+    updated, created = [], []
+    for product_id, other_id, count in zip(product_ids.tolist(), other_ids.tolist(), counts.tolist()):
+        if (product_id, other_id) in existing:
+            pk, current = existing[product_id, other_id]
+            updated.append(ProductCooccurrence(pk=pk, count=current + count))
+        else:
+            created.append(ProductCooccurrence(product_id=product_id, other_id=other_id, count=count))
+    ProductCooccurrence.objects.bulk_update(updated, ['count'], batch_size=500)
+    ProductCooccurrence.objects.bulk_create(created, batch_size=500)
+    return affected
+
+
+def _rebuild_top_k(product_ids, k):
+    """Recompute the top-``k`` neighbours of ``product_ids`` from their full counts."""
+    rows = np.array(
+        ProductCooccurrence.objects.filter(product_id__in=product_ids)
+        .values_list('product_id', 'other_id', 'count'),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    ProductRecommendation.objects.filter(product_id__in=product_ids).delete()
+    if not len(rows):
+        return 0
+    product, other, count = rows[:, 0], rows[:, 1], rows[:, 2]
+    order = np.lexsort((other, -count, product))
+    product, other, count = product[order], other[order], count[order]
+    _, starts, sizes = np.unique(product, return_index=True, return_counts=True)
+    rank = np.arange(len(product)) - np.repeat(starts, sizes)
+    keep = rank < k
+    recommendations = [
+        ProductRecommendation(product_id=p, recommended_id=o, rank=r, score=float(c))
+        for p, o, r, c in zip(product[keep].tolist(), other[keep].tolist(), rank[keep].tolist(), count[keep].tolist())
+    ]
+    ProductRecommendation.objects.bulk_create(recommendations, batch_size=500)
+    return len(recommendations)
+
+
+def update_recommendations(full=False, k=None, batch_size=5000):
+    """Fold orders placed since the last run into the recommendation tables.
+
+    Orders are processed in batches of ``batch_size``; only products that
+    appear in a batch get their co-occurrence counts and top-K rewritten.
+    ``full`` discards everything and replays the whole order history.
+    Returns the number of orders processed.
+    """
+    k = k or top_k()
+    processed = 0
+    with transaction.atomic():
+        state, _ = RecommendationState.objects.select_for_update().get_or_create(pk=1)
+        if full:
+            ProductCooccurrence.objects.all().delete()
+            ProductRecommendation.objects.all().delete()
+            state.last_order_id = 0
+            state.save(update_fields=['last_order_id', 'updated_at'])
+    while True:
+        with transaction.atomic():
+            # Archived orders keep their ids, so a full replay reads both tables.
+            order_ids = sorted(
+                pk for model in (Order, ArchivedOrder)
+                for pk in model.objects.filter(pk__gt=state.last_order_id).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )[:batch_size]
+            if not order_ids:
+                break
+            rows = np.array(
+                [row for model in (OrderItem, ArchivedOrderItem)
+                 for row in model.objects.filter(order_id__gt=state.last_order_id, order_id__lte=order_ids[-1])
+                 .values_list('order_id', 'product_id')],
+                dtype=np.int64,
+            ).reshape(-1, 2)
+            if len(rows):
+                affected = _merge_counts(*_cooccurrence_deltas(rows))
+                _rebuild_top_k(affected, k)
+            state.last_order_id = order_ids[-1]
+            state.save(update_fields=['last_order_id', 'updated_at'])
+        processed += len(order_ids)
+    return processed
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .inventory import InsufficientStock, apply_movements
+from .models import InventoryMovement, Product, StockReservation
+
+
+def reservations_enabled():
+    return getattr(settings, 'STOCK_RESERVATIONS', False)
+
+
+def reservation_ttl():
+    return timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def reserve(cart, product, quantity):
+    """Hold ``quantity`` more units of ``product`` for ``cart``.
+
+    ``Product.reserved`` is the running total of held units, so the check is
+    a single conditional UPDATE on the product row. Returns False when not
+    enough unreserved stock is left.
+    """
+    if quantity <= 0:
+        raise ValueError(f'Can only reserve a positive quantity, not {quantity}')
+    expires_at = timezone.now() + reservation_ttl()
+    with transaction.atomic():
+        updated = Product.objects.filter(
+            pk=product.pk, stock__gte=F('reserved') + quantity
+        ).update(reserved=F('reserved') + quantity)
+        if not updated:
+            return False
+        reservation, created = StockReservation.objects.get_or_create(
+            cart=cart, product=product,
+            defaults={'quantity': quantity, 'expires_at': expires_at},
+        )
+        if not created:
+            StockReservation.objects.filter(pk=reservation.pk).update(
+                quantity=F('quantity') + quantity, expires_at=expires_at
+            )
+    return True
+
+
+def _release_rows(rows):
+    """Return (product_id, quantity) rows to the pool and drop them."""
+    totals = {}
+    for pk, product_id, quantity in rows:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    if totals:
+        Product.objects.filter(pk__in=totals).update(reserved=Case(
+            *[When(pk=product_id, then=F('reserved') - Value(quantity)) for product_id, quantity in totals.items()],
+            output_field=IntegerField(),
+        ))
+        StockReservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return totals
+
+
+def release(cart, product_ids=None):
+    """Drop the cart's holds, optionally only for ``product_ids``."""
+    queryset = StockReservation.objects.filter(cart=cart)
+    if product_ids is not None:
+        queryset = queryset.filter(product_id__in=product_ids)
+    with transaction.atomic():
+        _release_rows(list(queryset.values_list('pk', 'product_id', 'quantity')))
+
+
+def release_carts(cart_ids):
+    """Drop every hold of the carts ``cart_ids``; call inside a transaction."""
+    return _release_rows(list(
+        StockReservation.objects.filter(cart_id__in=cart_ids).values_list('pk', 'product_id', 'quantity')
+    ))
+
+
+def convert(cart, items, order=None):
+    """Turn the cart's holds into a sale of ``items`` (cart items).
+
+    Each line decrements ``stock`` by the ordered quantity and ``reserved`` by
+    whatever this cart was holding, provided the stock not held by other
+    carts covers the order. The sale is then taken from the warehouses that
+    ``inventory.apply_movements`` allocates. Must run inside the checkout
+    transaction.
+    """
+    held = dict(StockReservation.objects.filter(cart=cart).values_list('product_id', 'quantity'))
+    for item in items:
+        own = held.get(item.product_id, 0)
+        updated = Product.objects.filter(
+            pk=item.product_id, stock__gte=F('reserved') - own + item.quantity
+        ).update(stock=F('stock') - item.quantity, reserved=F('reserved') - own, updated_at=timezone.now())
+        if not updated:
+            raise InsufficientStock(item.product)
+    StockReservation.objects.filter(cart=cart).delete()
+    apply_movements([
+        InventoryMovement(product_id=item.product_id, kind=InventoryMovement.SALE, quantity=-item.quantity, order=order)
+        for item in items
+    ], product_stock=False)
+
+
+def sweep_expired(batch_size=500, now=None):
+    """Release expired holds in batches of ``batch_size``.
+
+    Each batch is its own short transaction driven by the ``expires_at``
+    index. Returns the number of reservations released.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                StockReservation.objects.filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            _release_rows(rows)
+        released += len(rows)
+        if len(rows) < batch_size:
+            return released
@@ -0,0 +1,93 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autocomplete, media, similarity
+from .listing import refresh_category, refresh_products
+from .models import Category, Product, ProductImage
+
+
+def _is_own_delete(origin, model):
+    # Images removed by a Product/Category cascade take the listing row with them.
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+def _touch_products(queryset):
+    # Cached product representations are keyed by Product.updated_at, so a change
+    # to something a product renders (its images, its category's name) bumps it.
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_products([instance.pk])
+        similarity.mark_changed(instance.pk)
+        autocomplete.mark_changed(autocomplete.PRODUCT, instance.pk)
+        autocomplete.mark_changed(autocomplete.CATEGORY, instance.category_id)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    similarity.mark_changed(instance.pk)
+    autocomplete.mark_changed(autocomplete.PRODUCT, instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        autocomplete.mark_changed(autocomplete.CATEGORY, instance.pk)
+    if not created and not raw:
+        refresh_category(instance)
+        _touch_products(Product.objects.filter(category=instance))
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    autocomplete.mark_changed(autocomplete.CATEGORY, instance.pk)
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _touch_products(Product.objects.filter(pk=instance.product_id))
+        refresh_products([instance.product_id])
+
+
+@receiver(post_delete, sender=ProductImage)
+def product_image_deleted(sender, instance, origin=None, **kwargs):
+    if _is_own_delete(origin, ProductImage):
+        _touch_products(Product.objects.filter(pk=instance.product_id))
+        refresh_products([instance.product_id])
+
+
+def _file_names(instance):
+    # Raw column values, read from __dict__ so deferred fields aren't fetched.
+    return {
+        field: media.stored_name(instance.__dict__[field])
+        for model, field in media.MEDIA_FIELDS
+        if model is type(instance) and field in instance.__dict__
+    }
+
+
+@receiver(post_init, sender=ProductImage)
+@receiver(post_init, sender=Category)
+def media_loaded(sender, instance, **kwargs):
+    instance._loaded_file_names = _file_names(instance)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=Category)
+def media_saved(sender, instance, **kwargs):
+    new_names = _file_names(instance)
+    for field, old_name in getattr(instance, '_loaded_file_names', {}).items():
+        if old_name != new_names.get(field):
+            media.release_on_commit(old_name)
+    instance._loaded_file_names = new_names
+
+
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+def media_deleted(sender, instance, **kwargs):
+    for name in _file_names(instance).values():
+        media.release_on_commit(name)
@@ -0,0 +1,189 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .feeds import ChangeFeed
+from .models import Product
+
+COLORS = [value for value, _ in Product.COLOR_CHOICES]
+MATERIALS = [value for value, _ in Product.MATERIAL_CHOICES]
+COLOR_OFFSET = 0
+MATERIAL_OFFSET = COLOR_OFFSET + len(COLORS)
+PRICE_COLUMN = MATERIAL_OFFSET + len(MATERIALS)
+CATEGORY_OFFSET = PRICE_COLUMN + 1
+
+METRICS = ('cosine', 'euclidean')
+
+
+def _choice_columns(values, choices, offset):
+    """Column index for each value (-1 for blank/unknown), mapped once per distinct value."""
+    lookup = {choice: offset + i for i, choice in enumerate(choices)}
+    distinct, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return np.array([lookup.get(value, -1) for value in distinct], dtype=np.int64)[inverse]
+
+
+class ProductFeatureIndex:
+    """In-memory feature matrix over products for nearest-neighbour queries.
+
+    Each row is one-hot color, one-hot material, standardized log price and
+    one-hot category. Category columns are appended as new categories show
+    up, so rows can be upserted without rebuilding the matrix.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.features = np.empty((0, CATEGORY_OFFSET), dtype=np.float32)
+        self.sq_norms = np.empty(0, dtype=np.float32)
+        self.active = np.empty(0, dtype=bool)
+        self.positions = {}
+        self.category_columns = {}
+        self.price_mean = 0.0
+        self.price_std = 1.0
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def _category_column_array(self, category_ids):
+        distinct, inverse = np.unique(np.asarray(category_ids, dtype=np.int64), return_inverse=True)
+        new = [int(c) for c in distinct if int(c) not in self.category_columns]
+        if new:
+            for category_id in new:
+                self.category_columns[category_id] = CATEGORY_OFFSET + len(self.category_columns)
+            extra = np.zeros((len(self.features), len(new)), dtype=np.float32)
+            self.features = np.hstack([self.features, extra])
+        return np.array([self.category_columns[int(c)] for c in distinct], dtype=np.int64)[inverse]
+
+    def _encode(self, category_ids, colors, materials, prices):
+        category_cols = self._category_column_array(category_ids)
+        n = len(category_cols)
+        rows = np.arange(n)
+        encoded = np.zeros((n, self.features.shape[1]), dtype=np.float32)
+        for columns in (_choice_columns(colors, COLORS, COLOR_OFFSET),
+                        _choice_columns(materials, MATERIALS, MATERIAL_OFFSET)):
+            known = columns >= 0
+            encoded[rows[known], columns[known]] = 1.0
+        log_prices = np.log(np.asarray(prices, dtype=np.float64))
+        encoded[:, PRICE_COLUMN] = (log_prices - self.price_mean) / self.price_std
+        encoded[rows, category_cols] = 1.0
+        return encoded
+
+    def load(self, ids, category_ids, colors, materials, prices):
+        """Replace the index contents; price scaling is fixed from this data."""
+        self._reset()
+        log_prices = np.log(np.asarray(prices, dtype=np.float64))
+        if len(log_prices):
+            self.price_mean = float(log_prices.mean())
+            self.price_std = float(log_prices.std()) or 1.0
+        self.upsert(ids, category_ids, colors, materials, prices)
+
+    def upsert(self, ids, category_ids, colors, materials, prices):
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        encoded = self._encode(category_ids, colors, materials, prices)
+        rows = np.array([self.positions.get(int(pk), -1) for pk in ids], dtype=np.int64)
+        existing = rows >= 0
+        sq_norms = np.einsum('ij,ij->i', encoded, encoded)
+        self.features[rows[existing]] = encoded[existing]
+        self.sq_norms[rows[existing]] = sq_norms[existing]
+        self.active[rows[existing]] = True
+        new_ids = ids[~existing]
+        if len(new_ids):
+            start = len(self.ids)
+            self.positions.update((int(pk), start + i) for i, pk in enumerate(new_ids))
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.features = np.vstack([self.features, encoded[~existing]])
+            self.sq_norms = np.concatenate([self.sq_norms, sq_norms[~existing]])
+            self.active = np.concatenate([self.active, np.ones(len(new_ids), dtype=bool)])
+
+    def remove(self, ids):
+        rows = [self.positions[pk] for pk in ids if pk in self.positions]
+        self.active[rows] = False
+
+    def neighbours(self, product_ids, k=10, metric='cosine', chunk_size=64):
+        """Return ``{product_id: [neighbour ids, best first]}`` for active indexed ids."""
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric!r}')
+        query_ids = [pk for pk in product_ids if pk in self.positions and self.active[self.positions[pk]]]
+        result = {}
+        k = min(k, max(len(self.ids) - 1, 0))
+        if not k:
+            return {pk: [] for pk in query_ids}
+        for start in range(0, len(query_ids), chunk_size):
+            chunk = query_ids[start:start + chunk_size]
+            rows = np.array([self.positions[pk] for pk in chunk], dtype=np.int64)
+            dots = self.features[rows] @ self.features.T
+            if metric == 'cosine':
+                norms = np.sqrt(self.sq_norms)
+                scores = dots / np.maximum(norms[rows, None] * norms[None, :], 1e-12)
+            else:
+                scores = 2 * dots - self.sq_norms[rows, None] - self.sq_norms[None, :]
+            scores[:, ~self.active] = -np.inf
+            scores[np.arange(len(rows)), rows] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            top = np.take_along_axis(top, np.argsort(-top_scores, axis=1, kind='stable'), axis=1)
+            for pk, neighbour_rows, row_scores in zip(chunk, top, np.take_along_axis(scores, top, axis=1)):
+                result[pk] = self.ids[neighbour_rows[np.isfinite(row_scores)]].tolist()
+        return result
+
+
+_index = None
+_feed = None
+_changed = set()
+_lock = threading.Lock()
+
+
+def _product_rows(queryset):
+    return queryset.values_list('pk', 'category_id', 'color', 'material', 'price', 'is_available')
+
+
+def _columns(rows):
+    """Split ``(pk, category_id, color, material, price)`` rows into ``load``/``upsert`` arguments."""
+    return [list(column) for column in zip(*rows)] or [[], [], [], [], []]
+
+
+def _apply(index, rows):
+    index.upsert(*_columns([row[:5] for row in rows if row[5]]))
+    index.remove([row[0] for row in rows if not row[5]])
+
+
+def mark_changed(product_id):
+    """Queue a product for re-encoding on this process's next query."""
+    with _lock:
+        _changed.add(product_id)
+
+
+def get_index():
+    """Return this process's index, applying local and polled catalog changes.
+
+    Other workers' writes are picked up by polling ``Product.updated_at`` at
+    most every ``SIMILAR_PRODUCTS_POLL_INTERVAL`` seconds.
+    """
+    global _index, _feed
+    with _lock:
+        if _index is None:
+            _feed = ChangeFeed(getattr(settings, 'SIMILAR_PRODUCTS_POLL_INTERVAL', 30))
+            _feed.start()
+            _index = ProductFeatureIndex()
+            _index.load(*_columns([row[:5] for row in _product_rows(Product.objects.filter(is_available=True))]))
+            _changed.clear()
+            return _index
+        if _feed.due():
+            rows = _feed.changed(_product_rows(Product.objects.all()))
+            _changed.difference_update(row[0] for row in rows)
+            _apply(_index, rows)
+        if _changed:
+            rows = list(_product_rows(Product.objects.filter(pk__in=_changed)))
+            _index.remove(_changed - {row[0] for row in rows})
+            _apply(_index, rows)
+            _changed.clear()
+        return _index
+
+
+def similar_products(product_id, k=10, metric='cosine'):
+    return get_index().neighbours([product_id], k=k, metric=metric).get(product_id)
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+HASH_LENGTH = 32
+# <upload_to>/<first two hash chars>/<hash><ext>
+HASHED_NAME = re.compile(rf'(?:^|/)([0-9a-f]{{2}})/(\1[0-9a-f]{{{HASH_LENGTH - 2}}})\.[0-9a-z]+$')
+INCOMING_DIR = '.incoming'
+
+
+def content_hash(name):
+    """The content hash embedded in a name written by HashedMediaStorage, or None."""
+    match = HASHED_NAME.search(name)
+    return match.group(2) if match else None
+
+
+def hashed_name(name, sha256):
+    """Where content with the given SHA-256 hex digest is stored for an upload called ``name``."""
+    digest = sha256[:HASH_LENGTH]
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """File system storage that names uploads after a hash of their content.
+
+    ``products/chair.jpg`` is stored as ``products/3f/3fa2...e1.jpg``. A name
+    therefore always refers to the same bytes, which lets the media view
+    mark responses immutable. Uploads are hashed while they are streamed to
+    a temporary file under ``MEDIA_ROOT``; if the same bytes are already
+    stored the temporary file is dropped and the existing file reused. Every
+    save counts as a reference in ``store.MediaFile`` (see ``store.media``).
+    """
+
+    def _spool(self, content):
+        """Copy ``content`` to a temporary file, returning ``(path, sha256, size)``."""
+        directory = self.path(INCOMING_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory)
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, 'wb') as spool:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    spool.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, digest.hexdigest(), size
+
+    def save(self, name, content, max_length=None):
+        from . import media
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        spool_path, sha256, size = self._spool(content)
+        try:
+            name = hashed_name(name, sha256)
+            full_path = self.path(name)
+            with transaction.atomic():
+                # The claim locks the MediaFile row, so a concurrent release of
+                # the last reference can't remove the file between here and commit.
+                media.claim(name, sha256, size)
+                if not os.path.exists(full_path):
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(spool_path, full_path)
+                    os.chmod(full_path, self.file_permissions_mode or 0o644)
+        finally:
+            if os.path.exists(spool_path):
+                os.remove(spool_path)
+        return name
+
+
+def canonical_name(name, sha256):
+    """The HashedMediaStorage name for ``name``'s upload directory and content."""
+    if content_hash(name):
+        name = posixpath.join(posixpath.dirname(posixpath.dirname(name)), posixpath.basename(name))
+    return hashed_name(name, sha256)
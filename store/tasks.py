@@ -0,0 +1,29 @@
+"""Celery tasks for the maintenance commands that run on a schedule.
+
+Each task calls the same function as its management command, so cron and
+Celery beat are interchangeable ways to run them.
+"""
+from celery import shared_task
+
+from .carts import purge_stale_carts
+from .pricing import run_due
+from .reservations import reservations_enabled, sweep_expired
+
+
+@shared_task(ignore_result=True)
+def sweep_reservations():
+    """``manage.py sweep_reservations``."""
+    if reservations_enabled():
+        return sweep_expired()
+
+
+@shared_task(ignore_result=True)
+def apply_price_lists():
+    """``manage.py apply_price_lists``, once."""
+    return [(str(price_list), action, products) for price_list, action, products in run_due()]
+
+
+@shared_task(ignore_result=True)
+def purge_carts():
+    """``manage.py purge_carts`` with its defaults."""
+    return purge_stale_carts(pause=0.05)
@@ -1,3 +1,127 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import inventory, reservations
+from .models import Cart, CartItem, Category, InventoryMovement, Order, OrderItem, Product, StockReservation, Warehouse, WarehouseStock
+
+
+class InventoryTestCase(TestCase):
+    """A product stocked through the ledger in two warehouses, two units each."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Chairs')
+        self.product = Product.objects.create(
+            name='Chair', category=category, description='A chair', price=Decimal('50.00'),
+        )
+        self.main = Warehouse.objects.get(code='main')  # Opened by the warehouses migration.
+        self.north = Warehouse.objects.create(name='North', code='north', priority=1)
+        inventory.restock(self.main, {self.product.pk: 2})
+        inventory.restock(self.north, {self.product.pk: 2})
+        self.user = get_user_model().objects.create_user('buyer', 'buyer@example.com', 'secret')
+
+    def place_order(self, quantity):
+        order = Order.objects.create(
+            user=self.user, total_amount=self.product.price * quantity, shipping_address='Street 1', phone='123',
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=self.product.price)
+        inventory.apply_movements([
+            InventoryMovement(product_id=self.product.pk, kind=InventoryMovement.SALE, quantity=-quantity, order=order)
+        ])
+        return order
+
+    def assertStock(self, stock, by_warehouse):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, stock)
+        self.assertEqual(
+            dict(WarehouseStock.objects.filter(product=self.product).values_list('warehouse__code', 'quantity')),
+            by_warehouse,
+        )
+        self.assertEqual(inventory.verify(), [])
+        self.assertEqual(inventory.verify_warehouses(), [])
+
+
+class ReturnOrderTests(InventoryTestCase):
+    def test_sale_is_split_across_warehouses(self):
+        self.place_order(3)
+        self.assertStock(1, {'main': 0, 'north': 1})
+
+    def test_return_puts_stock_back_where_it_was_taken(self):
+        order = self.place_order(3)
+        inventory.return_order(order)
+        self.assertStock(4, {'main': 2, 'north': 2})
+
+    def test_second_return_is_a_no_op(self):
+        order = self.place_order(2)
+        inventory.return_order(order)
+        self.assertEqual(inventory.return_order(order), [])
+        self.assertStock(4, {'main': 2, 'north': 2})
+        self.assertEqual(order.movements.filter(kind=InventoryMovement.CANCEL_RETURN).count(), 1)
+
+    def test_order_without_sale_movements_returns_its_items_once(self):
+        order = Order.objects.create(user=self.user, total_amount=Decimal('50.00'), shipping_address='Street 1', phone='1')
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=self.product.price)
+        inventory.return_order(order)
+        inventory.return_order(order)
+        self.assertStock(5, {'main': 3, 'north': 2})
+
+
+@override_settings(STOCK_RESERVATIONS=True)
+class ReservationTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cart = Cart.objects.create(user=self.user)
+
+    def test_reserve_rejects_non_positive_quantities(self):
+        for quantity in (0, -3):
+            with self.assertRaises(ValueError):
+                reservations.reserve(self.cart, self.product, quantity)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_reserve_holds_at_most_the_stock(self):
+        self.assertTrue(reservations.reserve(self.cart, self.product, 3))
+        self.assertFalse(reservations.reserve(self.cart, self.product, 2))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 3)
+
+    def test_release_returns_holds(self):
+        reservations.reserve(self.cart, self.product, 3)
+        reservations.release(self.cart)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_convert_sells_held_stock(self):
+        reservations.reserve(self.cart, self.product, 3)
+        item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=3)
+        order = Order.objects.create(user=self.user, total_amount=Decimal('150.00'), shipping_address='Street 1', phone='1')
+        reservations.convert(self.cart, [item], order=order)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+        self.assertStock(1, {'main': 0, 'north': 1})
+
+
+class OrderAdminTests(InventoryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = site._registry[Order]
+        self.request = RequestFactory().get('/')
+        self.request.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    def test_canceled_order_status_is_read_only(self):
+        order = self.place_order(2)
+        self.assertNotIn('status', self.admin.get_readonly_fields(self.request, order))
+        order.status = 'canceled'
+        self.assertIn('status', self.admin.get_readonly_fields(self.request, order))
+
+    def test_canceling_returns_stock(self):
+        order = self.place_order(2)
+        order.status = 'canceled'
+        form = self.admin.get_form(self.request, order)(instance=order)
+        form.changed_data.append('status')
+        self.admin.save_model(self.request, order, form, change=True)
+        self.assertStock(4, {'main': 2, 'north': 2})
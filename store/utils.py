@@ -0,0 +1,22 @@
+from django.db.models import Q
+
+from .models import Product
+
+
+def resolve_products(keys, strict=True):
+    """``{key: product id}`` for ``keys`` that are product ids or slugs.
+
+    Raises ValueError naming the unknown keys, unless ``strict`` is false,
+    in which case they are left out.
+    """
+    keys = set(keys)
+    ids = {
+        key: pk for pk, slug in Product.objects.filter(
+            Q(slug__in=keys) | Q(pk__in=[key for key in keys if key.isdigit()])
+        ).values_list('pk', 'slug')
+        for key in (str(pk), slug) if key in keys
+    }
+    missing = sorted(keys - ids.keys())
+    if missing and strict:
+        raise ValueError(f'unknown products: {", ".join(missing[:10])}')
+    return ids